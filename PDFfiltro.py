@@ -1,11 +1,12 @@
 import os
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import fitz  # PyMuPDF
 import threading
+import multiprocessing
 import queue
 import ttkbootstrap as ttk
 from collections import defaultdict
+from busca_pdf import ler_termos, carregar_termos, listar_pdfs_pasta, filtrar_pdfs, pre_visualizar, exportar_acertos
 
 # === TEMAS DISPONÍVEIS ===
 temas_disponíveis = {
@@ -23,6 +24,12 @@ temas_disponíveis = {
 }
 tema_atual = "🔥 Cyberpunk Noite"
 
+# PDFs selecionados, na ordem da lista_pdfs (dict como conjunto ordenado: checagem de repetidos sem varrer a lista)
+pdfs_selecionados = {}
+
+# Acertos da pré-visualização, na mesma ordem das linhas de lista_acertos: (pdf, página, termo, trecho)
+acertos_previa = []
+
 # === FUNÇÕES ===
 def mudar_tema(event=None):
     global tema_atual
@@ -44,44 +51,12 @@ def fechar_loading():
     if janela_loading:
         janela_loading.destroy()
 
-def processar_pdfs(pdfs_por_pasta, termo_busca, pasta_saida, fila):
-    total_pdfs = sum(len(arquivos) for arquivos in pdfs_por_pasta.values())
-    processados = 0
-    for pasta, arquivos in pdfs_por_pasta.items():
-        try:
-            pdf_writer = fitz.open()
-            paginas_filtradas = []
-
-            for pdf_path in arquivos:
-                doc = fitz.open(pdf_path)
-                for num_pagina in range(len(doc)):
-                    texto = doc[num_pagina].get_text("text", flags=fitz.TEXTFLAGS_TEXT)
-                    if termo_busca in texto:
-                        pdf_writer.insert_pdf(doc, from_page=num_pagina, to_page=num_pagina)
-                        paginas_filtradas.append(num_pagina + 1)
-                doc.close()
-
-                processados += 1
-                progresso = int((processados / total_pdfs) * 100)
-                fila.put(progresso)
-
-            if paginas_filtradas:
-                nome_pasta = os.path.basename(pasta)
-                nome_arquivo = f"{nome_pasta}_filtrado.pdf"
-                caminho_saida = os.path.join(pasta_saida, nome_arquivo)
-                pdf_writer.save(caminho_saida)
-                print(f"[✅] Salvo: {caminho_saida} (Páginas: {paginas_filtradas})")
-            pdf_writer.close()
-        except Exception as e:
-            print(f"[❌] Erro ao processar PDFs em {pasta}: {e}")
-    fila.put("done")
-
 def buscar_em_multiplos_pdfs():
-    termo = entrada_numero.get().strip()
+    termos = ler_termos(entrada_numero.get())
     pasta_saida = entrada_saida.get().strip()
-    arquivos_pdf = lista_pdfs.get(0, tk.END)
+    arquivos_pdf = list(pdfs_selecionados)
 
-    if not termo or not pasta_saida:
+    if not termos or not pasta_saida:
         messagebox.showwarning("Aviso", "Preencha todos os campos!")
         return
 
@@ -105,7 +80,7 @@ def buscar_em_multiplos_pdfs():
         msg.after(2000, msg.destroy)
 
     def executar():
-        processar_pdfs(pdfs_por_pasta, termo, pasta_saida, fila)
+        filtrar_pdfs(pdfs_por_pasta, termos, pasta_saida, fila)
 
     def verificar_fila():
         try:
@@ -123,30 +98,116 @@ def buscar_em_multiplos_pdfs():
     threading.Thread(target=executar, daemon=True).start()
     verificar_fila()
 
+def pre_visualizar_acertos():
+    termos = ler_termos(entrada_numero.get())
+    arquivos_pdf = list(pdfs_selecionados)
+
+    if not termos:
+        messagebox.showwarning("Aviso", "Informe ao menos um termo de busca!")
+        return
+
+    if not arquivos_pdf:
+        messagebox.showwarning("Aviso", "Nenhum arquivo PDF selecionado.")
+        return
+
+    lista_acertos.delete(0, tk.END)
+    acertos_previa.clear()
+    fila = queue.Queue()
+
+    def executar():
+        pre_visualizar(list(arquivos_pdf), termos, fila)
+
+    def verificar_fila():
+        try:
+            while True:
+                valor = fila.get_nowait()
+                if valor == "done":
+                    fechar_loading()
+                    if not acertos_previa:
+                        messagebox.showinfo("Pré-visualização", "Nenhum termo encontrado nos PDFs.")
+                    return
+                if isinstance(valor, tuple):
+                    # Cada lote de acertos entra de uma vez na lista
+                    acertos_previa.extend(valor[1])
+                    lista_acertos.insert(tk.END, *(f"{os.path.basename(pdf)} | pág. {num_pagina + 1} | {termo} | {trecho}"
+                                                   for pdf, num_pagina, termo, trecho in valor[1]))
+                else:
+                    barra_progresso['value'] = valor
+        except queue.Empty:
+            janela.after(100, verificar_fila)
+
+    exibir_loading()
+    threading.Thread(target=executar, daemon=True).start()
+    verificar_fila()
+
+def exportar_selecionados():
+    selecionados = lista_acertos.curselection()
+    if not selecionados:
+        messagebox.showwarning("Aviso", "Selecione os resultados para exportar.")
+        return
+
+    caminho = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("Arquivos PDF", "*.pdf")],
+                                           initialdir=entrada_saida.get().strip() or None,
+                                           initialfile="resultados_selecionados.pdf")
+    if not caminho:
+        return
+
+    try:
+        total = exportar_acertos([acertos_previa[i] for i in selecionados], caminho)
+    except Exception as e:
+        messagebox.showerror("Erro", f"Não foi possível exportar: {e}")
+        return
+    messagebox.showinfo("✅ Concluído", f"{total} página(s) exportada(s) para {caminho}")
+
+def adicionar_pdfs(caminhos):
+    novos = [caminho for caminho in dict.fromkeys(caminhos) if caminho not in pdfs_selecionados]
+    if novos:
+        pdfs_selecionados.update(dict.fromkeys(novos))
+        lista_pdfs.insert(tk.END, *novos)
+
 def selecionar_pdfs():
     arquivos = filedialog.askopenfilenames(filetypes=[("Arquivos PDF", "*.pdf")])
     if arquivos:
-        for arquivo in arquivos:
-            if arquivo not in lista_pdfs.get(0, tk.END):
-                lista_pdfs.insert(tk.END, arquivo)
+        adicionar_pdfs(arquivos)
 
 def selecionar_pasta():
     pasta = filedialog.askdirectory()
     if pasta:
-        for raiz, _, arquivos in os.walk(pasta):
-            for nome in arquivos:
-                if nome.endswith(".pdf"):
-                    caminho = os.path.join(raiz, nome)
-                    if caminho not in lista_pdfs.get(0, tk.END):
-                        lista_pdfs.insert(tk.END, caminho)
+        # A árvore é lida em segundo plano; os caminhos chegam em lotes e entram na lista de uma vez
+        fila = queue.Queue()
+
+        def executar():
+            for lote in listar_pdfs_pasta(pasta):
+                fila.put(lote)
+            fila.put("done")
+
+        def verificar_fila():
+            try:
+                while True:
+                    lote = fila.get_nowait()
+                    if lote == "done":
+                        return
+                    adicionar_pdfs(lote)
+            except queue.Empty:
+                janela.after(100, verificar_fila)
+
+        threading.Thread(target=executar, daemon=True).start()
+        verificar_fila()
 
 def remover_pdf():
     try:
         selecionado = lista_pdfs.curselection()[0]
+        del pdfs_selecionados[lista_pdfs.get(selecionado)]
         lista_pdfs.delete(selecionado)
     except IndexError:
         messagebox.showwarning("Aviso", "Selecione um arquivo para remover.")
 
+def carregar_arquivo_termos():
+    caminho = filedialog.askopenfilename(filetypes=[("Arquivos de texto", "*.txt"), ("Todos os arquivos", "*.*")])
+    if caminho:
+        entrada_numero.delete(0, tk.END)
+        entrada_numero.insert(0, "; ".join(carregar_termos(caminho)))
+
 def salvar_em():
     pasta = filedialog.askdirectory()
     if pasta:
@@ -154,54 +215,75 @@ def salvar_em():
         entrada_saida.insert(0, pasta)
 
 # === INTERFACE ===
-janela = ttk.Window(themename=temas_disponíveis[tema_atual])
-janela.title("🔍 Filtro de PDFs")
-janela.geometry("700x600")
-janela.minsize(600, 500)
-janela.rowconfigure(2, weight=1)
-janela.columnconfigure(0, weight=1)
-
-frame_superior = ttk.Frame(janela)
-frame_superior.pack(fill="x", pady=5)
-ttk.Label(frame_superior, text="📄 Filtro de PDFs", font=("Arial", 14, "bold")).pack(side="left", padx=10)
-
-frame_tema = ttk.Frame(janela)
-frame_tema.pack(pady=5)
-ttk.Label(frame_tema, text="🎨 Escolha um tema:", font=("Arial", 12)).pack(side="left", padx=5)
-combobox_temas = ttk.Combobox(frame_tema, values=list(temas_disponíveis.keys()), state="readonly")
-combobox_temas.pack(side="left", padx=5)
-combobox_temas.set(tema_atual)
-combobox_temas.bind("<<ComboboxSelected>>", mudar_tema)
-
-frame_lista = ttk.Frame(janela)
-frame_lista.pack(pady=5, padx=10, fill="both", expand=True)
-scrollbar = ttk.Scrollbar(frame_lista, orient="vertical")
-lista_pdfs = tk.Listbox(frame_lista, height=8, width=70)
-lista_pdfs.pack(side=tk.LEFT, fill="both", expand=True)
-scrollbar.pack(side=tk.RIGHT, fill="y")
-lista_pdfs.config(yscrollcommand=scrollbar.set)
-scrollbar.config(command=lista_pdfs.yview)
-
-frame_saida = ttk.Frame(janela)
-frame_saida.pack(pady=5, padx=10, fill="x")
-ttk.Label(frame_saida, text="📂 Pasta de saída:", font=("Arial", 12)).pack(side="left", padx=5)
-entrada_saida = ttk.Entry(frame_saida, width=50)
-entrada_saida.pack(side="left", padx=5)
-ttk.Button(frame_saida, text="Salvar em...", command=salvar_em).pack(side="left", padx=5)
-
-frame_termo = ttk.Frame(janela)
-frame_termo.pack(pady=5, padx=10, fill="x")
-ttk.Label(frame_termo, text="🔍 Termo de busca:", font=("Arial", 12)).pack(side="left", padx=5)
-entrada_numero = ttk.Entry(frame_termo, width=50)
-entrada_numero.pack(side="left", padx=5)
-
-frame_botoes = ttk.Frame(janela)
-frame_botoes.pack()
-ttk.Button(frame_botoes, text="Selecionar PDFs", command=selecionar_pdfs).pack(side=tk.LEFT, padx=5)
-ttk.Button(frame_botoes, text="Selecionar Pasta", command=selecionar_pasta).pack(side=tk.LEFT, padx=5)
-ttk.Button(frame_botoes, text="Remover Selecionado", command=remover_pdf).pack(side=tk.LEFT, padx=5)
-
-ttk.Button(janela, text="📥 Buscar e Salvar PDFs 📤", command=buscar_em_multiplos_pdfs).pack(pady=20)
+def criar_interface():
+    # A janela só é criada aqui (e não na importação) porque os processos da busca importam este
+    # módulo de novo no Windows; sem isso, cada processo abriria uma janela
+    global janela, combobox_temas, lista_pdfs, lista_acertos, entrada_saida, entrada_numero
+    janela = ttk.Window(themename=temas_disponíveis[tema_atual])
+    janela.title("🔍 Filtro de PDFs")
+    janela.geometry("700x780")
+    janela.minsize(600, 500)
+    janela.rowconfigure(2, weight=1)
+    janela.columnconfigure(0, weight=1)
+
+    frame_superior = ttk.Frame(janela)
+    frame_superior.pack(fill="x", pady=5)
+    ttk.Label(frame_superior, text="📄 Filtro de PDFs", font=("Arial", 14, "bold")).pack(side="left", padx=10)
+
+    frame_tema = ttk.Frame(janela)
+    frame_tema.pack(pady=5)
+    ttk.Label(frame_tema, text="🎨 Escolha um tema:", font=("Arial", 12)).pack(side="left", padx=5)
+    combobox_temas = ttk.Combobox(frame_tema, values=list(temas_disponíveis.keys()), state="readonly")
+    combobox_temas.pack(side="left", padx=5)
+    combobox_temas.set(tema_atual)
+    combobox_temas.bind("<<ComboboxSelected>>", mudar_tema)
+
+    frame_lista = ttk.Frame(janela)
+    frame_lista.pack(pady=5, padx=10, fill="both", expand=True)
+    scrollbar = ttk.Scrollbar(frame_lista, orient="vertical")
+    lista_pdfs = tk.Listbox(frame_lista, height=8, width=70)
+    lista_pdfs.pack(side=tk.LEFT, fill="both", expand=True)
+    scrollbar.pack(side=tk.RIGHT, fill="y")
+    lista_pdfs.config(yscrollcommand=scrollbar.set)
+    scrollbar.config(command=lista_pdfs.yview)
+
+    frame_saida = ttk.Frame(janela)
+    frame_saida.pack(pady=5, padx=10, fill="x")
+    ttk.Label(frame_saida, text="📂 Pasta de saída:", font=("Arial", 12)).pack(side="left", padx=5)
+    entrada_saida = ttk.Entry(frame_saida, width=50)
+    entrada_saida.pack(side="left", padx=5)
+    ttk.Button(frame_saida, text="Salvar em...", command=salvar_em).pack(side="left", padx=5)
+
+    frame_termo = ttk.Frame(janela)
+    frame_termo.pack(pady=5, padx=10, fill="x")
+    ttk.Label(frame_termo, text="🔍 Termos de busca (separe com ;):", font=("Arial", 12)).pack(side="left", padx=5)
+    entrada_numero = ttk.Entry(frame_termo, width=40)
+    entrada_numero.pack(side="left", padx=5)
+    ttk.Button(frame_termo, text="Carregar termos...", command=carregar_arquivo_termos).pack(side="left", padx=5)
+
+    frame_botoes = ttk.Frame(janela)
+    frame_botoes.pack()
+    ttk.Button(frame_botoes, text="Selecionar PDFs", command=selecionar_pdfs).pack(side=tk.LEFT, padx=5)
+    ttk.Button(frame_botoes, text="Selecionar Pasta", command=selecionar_pasta).pack(side=tk.LEFT, padx=5)
+    ttk.Button(frame_botoes, text="Remover Selecionado", command=remover_pdf).pack(side=tk.LEFT, padx=5)
+
+    ttk.Button(janela, text="📥 Buscar e Salvar PDFs 📤", command=buscar_em_multiplos_pdfs).pack(pady=10)
+
+    frame_acertos = ttk.Frame(janela)
+    frame_acertos.pack(pady=5, padx=10, fill="both", expand=True)
+    scrollbar_acertos = ttk.Scrollbar(frame_acertos, orient="vertical")
+    lista_acertos = tk.Listbox(frame_acertos, height=8, width=70, selectmode=tk.EXTENDED)
+    lista_acertos.pack(side=tk.LEFT, fill="both", expand=True)
+    scrollbar_acertos.pack(side=tk.RIGHT, fill="y")
+    lista_acertos.config(yscrollcommand=scrollbar_acertos.set)
+    scrollbar_acertos.config(command=lista_acertos.yview)
+
+    frame_previa = ttk.Frame(janela)
+    frame_previa.pack(pady=10)
+    ttk.Button(frame_previa, text="👁️ Pré-visualizar", command=pre_visualizar_acertos).pack(side=tk.LEFT, padx=5)
+    ttk.Button(frame_previa, text="📤 Exportar Selecionados", command=exportar_selecionados).pack(side=tk.LEFT, padx=5)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Necessário para o pool de processos no executável (PyInstaller)
+    criar_interface()
     janela.mainloop()
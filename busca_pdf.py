@@ -0,0 +1,444 @@
+import os
+import re
+import sqlite3
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import fitz  # PyMuPDF
+from cache_paginas import abrir_cache, identidade_arquivo, ler_textos, gravar_textos
+from documentos_pdf import agrupar_intervalos, abrir_documento, fechar_documentos
+
+# Índice local com o texto das páginas já lidas, reaproveitado entre buscas (fora do drive de rede).
+# Arquivo próprio: o texto aqui é extraído com TEXTFLAGS_TEXT, diferente do cache do SEFIP
+CAMINHO_INDICE_PADRAO = os.path.join(
+    os.environ.get('LOCALAPPDATA') or os.path.expanduser('~'), 'FiltroPDF', 'indice_paginas.sqlite3'
+)
+
+# Separadores aceitos entre termos digitados no campo de busca
+SEPARADORES_TERMOS = r"[;\n]"
+
+# Trechos de um termo que não podem ir para o nome do arquivo de saída
+CARACTERES_INVALIDOS = re.compile(r'[<>:"/\\|?*\s]+')
+
+# Páginas lidas por tarefa do pool; PDFs maiores são divididos em lotes entre os processos
+PAGINAS_POR_LOTE = 200
+
+# Caminhos enviados de uma vez à interface ao listar os PDFs de uma pasta
+PDFS_POR_LOTE_LISTAGEM = 500
+
+# Caracteres de contexto de cada lado do termo no trecho mostrado na pré-visualização
+MARGEM_TRECHO = 40
+
+# Busca compilada em cada processo do pool (ver iniciar_processo_busca)
+_busca_processo = None
+
+
+def ler_termos(texto):
+    """
+    Converte o texto do campo de busca ("1823-35; 1900-01") em lista de termos, sem repetições e na ordem digitada.
+    """
+    termos = (t.strip() for t in re.split(SEPARADORES_TERMOS, texto))
+    return list(dict.fromkeys(t for t in termos if t))
+
+
+def carregar_termos(caminho):
+    """
+    Lê um arquivo de texto com um termo por linha (ou separados por ';').
+    """
+    with open(caminho, encoding='utf-8-sig') as f:
+        return ler_termos(f.read())
+
+
+def listar_pdfs_pasta(pasta, tamanho_lote=PDFS_POR_LOTE_LISTAGEM):
+    """
+    Percorre a pasta e as subpastas com os.scandir (na mesma ordem do os.walk, sem stat extra por
+    arquivo) e gera os caminhos dos PDFs em listas de até tamanho_lote, para a interface ir mostrando
+    enquanto a árvore é lida. Subpastas sem permissão de leitura e links para pastas são ignorados, como no os.walk.
+    """
+    lote = []
+    pendentes = [pasta]
+    while pendentes:
+        atual = pendentes.pop()
+        subpastas = []
+        try:
+            with os.scandir(atual) as entradas:
+                for entrada in entradas:
+                    try:
+                        if entrada.is_dir():
+                            # Como no os.walk, links para pastas não são percorridos (evita laços de junções no drive);
+                            # is_junction só existe a partir do Python 3.12
+                            if not (entrada.is_symlink() or getattr(entrada, 'is_junction', bool)()):
+                                subpastas.append(entrada.path)
+                            continue
+                    except OSError:
+                        pass
+                    if entrada.name.endswith(".pdf"):
+                        lote.append(entrada.path)
+                        if len(lote) >= tamanho_lote:
+                            yield lote
+                            lote = []
+        except OSError:
+            continue
+        pendentes.extend(reversed(subpastas))
+    if lote:
+        yield lote
+
+
+def _regex_trie(no):
+    """
+    Monta a expressão regular de um nó da árvore de prefixos dos termos. Os filhos são tentados antes
+    do fim do termo, então cada posição casa o termo mais longo que começa nela.
+    """
+    ramos = [re.escape(c) + _regex_trie(filho) for c, filho in sorted(no.items()) if c != '']
+    if not ramos:
+        return ''
+    corpo = ramos[0] if len(ramos) == 1 else '(?:' + '|'.join(ramos) + ')'
+    return f'(?:{corpo})?' if '' in no else corpo
+
+
+def compilar_termos(termos):
+    """
+    Prepara a busca de vários termos em uma única passada pelo texto de cada página:
+    uma expressão regular em árvore de prefixos (cada posição do texto é testada uma vez, com custo
+    proporcional ao tamanho do termo, não à quantidade de termos), dentro de um lookahead para achar
+    também ocorrências sobrepostas.
+    Retorna dict {'regex', 'contidos': {termo: [termos que são trechos dele]}} usado por termos_na_pagina.
+    """
+    raiz = {}
+    for termo in termos:
+        no = raiz
+        for c in termo:
+            no = no.setdefault(c, {})
+        no[''] = {}
+    # Em cada posição só o termo mais longo é capturado; os termos contidos nele também ocorrem
+    contidos = {t: [u for u in termos if u != t and u in t] for t in termos}
+    return {'regex': re.compile(f'(?=({_regex_trie(raiz)}))'), 'contidos': contidos}
+
+
+def termos_na_pagina(texto, busca):
+    """
+    Conjunto dos termos (de compilar_termos) que aparecem no texto.
+    """
+    encontrados = set(m.group(1) for m in busca['regex'].finditer(texto) if m.group(1))
+    for termo in list(encontrados):
+        encontrados.update(busca['contidos'][termo])
+    return encontrados
+
+
+def iniciar_processo_busca(termos):
+    """
+    Inicializador dos processos do pool: compila os termos uma vez por processo.
+    """
+    global _busca_processo
+    _busca_processo = compilar_termos(termos)
+
+
+def extrair_texto(pagina):
+    """
+    Texto de uma página como os filtros comparam com os termos.
+    """
+    return pagina.get_text("text", flags=fitz.TEXTFLAGS_TEXT)
+
+
+def trecho(texto, termo, margem=MARGEM_TRECHO):
+    """
+    Trecho do texto em volta da primeira ocorrência do termo, numa linha só, para a pré-visualização.
+    """
+    pos = texto.find(termo)
+    return ' '.join(texto[max(0, pos - margem):pos + len(termo) + margem].split())
+
+
+def acertos_pagina(texto, num_pagina, busca, com_trechos=False):
+    """
+    Acertos de uma página: [(termo, página, trecho)], com trecho None sem com_trechos.
+    """
+    return [(termo, num_pagina, trecho(texto, termo) if com_trechos else None)
+            for termo in termos_na_pagina(texto, busca)]
+
+
+def buscar_termos_lote(pdf_path, inicio=0, fim=None, com_textos=False, com_trechos=False):
+    """
+    Tarefa do pool: lê as páginas [inicio, fim) do PDF uma única vez para todos os termos.
+    Sem fim, lê no máximo PAGINAS_POR_LOTE páginas a partir de inicio; quem chama distribui o restante.
+    Retorna (total_paginas_pdf, inicio, fim, acertos, textos) com os acertos de acertos_pagina (páginas
+    a partir de 0); textos é a lista dos textos lidos, para o índice, com com_textos, e None sem.
+    """
+    acertos = []
+    textos = []
+    with fitz.open(pdf_path) as doc:
+        total = len(doc)
+        fim = min(total, inicio + PAGINAS_POR_LOTE) if fim is None else fim
+        for num_pagina in range(inicio, fim):
+            texto = extrair_texto(doc[num_pagina])
+            acertos.extend(acertos_pagina(texto, num_pagina, _busca_processo, com_trechos))
+            textos.append(texto)
+    return total, inicio, fim, acertos, textos if com_textos else None
+
+
+def abrir_indice(caminho_indice):
+    """
+    Abre o índice de páginas em caminho_indice (None se caminho_indice for None). Se não houver como
+    usá-lo (banco travado, disco cheio, pasta sem permissão), avisa e retorna None: a busca segue sem índice.
+    """
+    if not caminho_indice:
+        return None
+    try:
+        return abrir_cache(caminho_indice, tabelas=('textos',))
+    except (sqlite3.Error, OSError) as e:
+        avisar_indice(e)
+        return None
+
+
+def avisar_indice(erro):
+    """
+    Aviso de que o índice falhou e a busca segue lendo os PDFs.
+    """
+    print(f"⚠️ Índice de páginas indisponível, lendo os PDFs direto: {erro}")
+
+
+def textos_pdf(pdf_path, con=None):
+    """
+    Textos de todas as páginas do PDF: do índice (conexão de abrir_indice), se o arquivo não mudou desde
+    que foi indexado; senão, extraídos do PDF e gravados no índice. Falhas no índice só geram aviso.
+    """
+    identidade = identidade_arquivo(pdf_path) if con is not None else None
+    if con is not None:
+        try:
+            indexado = ler_textos(con, pdf_path, identidade)
+        except (sqlite3.Error, OSError) as e:
+            avisar_indice(e)
+            con = indexado = None
+        if indexado is not None:
+            return indexado
+    with fitz.open(pdf_path) as doc:
+        textos = [extrair_texto(pagina) for pagina in doc]
+    if con is not None:
+        try:
+            gravar_textos(con, pdf_path, identidade, textos)
+            con.commit()
+        except (sqlite3.Error, OSError) as e:
+            avisar_indice(e)
+    return textos
+
+
+def gravar_saida(paginas, caminho_saida, docs_abertos):
+    """
+    Salva em caminho_saida as páginas [(pdf, página), ...], copiando cada intervalo contíguo com um
+    único insert_pdf. docs_abertos (OrderedDict, ver abrir_documento) guarda as origens abertas entre chamadas.
+    """
+    pdf_writer = fitz.open()
+    try:
+        for p, inicio, fim in agrupar_intervalos(paginas):
+            pdf_writer.insert_pdf(abrir_documento(docs_abertos, p), from_page=inicio, to_page=fim)
+        pdf_writer.save(caminho_saida)
+    finally:
+        pdf_writer.close()
+
+
+def nome_saida(nome_pasta, termo, termos):
+    """
+    Nome do PDF filtrado: <pasta>_filtrado.pdf com um termo só; com vários, <pasta>_<termo>_filtrado.pdf
+    (caracteres inválidos em nomes de arquivo viram '_').
+    """
+    if len(termos) == 1:
+        return f"{nome_pasta}_filtrado.pdf"
+    return f"{nome_pasta}_{CARACTERES_INVALIDOS.sub('_', termo)}_filtrado.pdf"
+
+
+def gravar_pasta(pasta, paginas_por_termo, termos, pasta_saida, ordem):
+    """
+    Grava os PDFs filtrados de uma pasta, um por termo encontrado (ver nome_saida), com as páginas
+    na ordem dos arquivos selecionados (ordem: {pdf: posição}).
+    """
+    docs_abertos = OrderedDict()
+    try:
+        nome_pasta = os.path.basename(pasta)
+        for termo in termos:
+            paginas_filtradas = sorted(paginas_por_termo.get(termo, ()), key=lambda hit: (ordem[hit[0]], hit[1]))
+            if paginas_filtradas:
+                caminho_saida = os.path.join(pasta_saida, nome_saida(nome_pasta, termo, termos))
+                gravar_saida(paginas_filtradas, caminho_saida, docs_abertos)
+                print(f"[✅] Salvo: {caminho_saida} (Páginas: {[num_pagina + 1 for _, num_pagina in paginas_filtradas]})")
+    except Exception as e:
+        print(f"[❌] Erro ao processar PDFs em {pasta}: {e}")
+    finally:
+        fechar_documentos(docs_abertos)
+
+
+def buscar_pdfs(pdfs, termos, max_workers=None, caminho_indice=CAMINHO_INDICE_PADRAO, com_trechos=False):
+    """
+    Lê cada página dos pdfs uma única vez para todos os termos, consultando o índice de caminho_indice
+    (None o desativa). Gera (pdf, fracao, acertos, concluido) a cada lote lido, na ordem em que terminam.
+    """
+    busca = compilar_termos(termos)
+    # Textos dos PDFs em leitura no pool, montados lote a lote para o índice: {pdf: (identidade, textos)}
+    para_indexar = {}
+    # Lotes em leitura e fração já gerada de cada PDF do pool: {pdf: lotes} e {pdf: fração}
+    lotes_pdf = {}
+    fracao_gerada = {}
+    con = abrir_indice(caminho_indice)
+    executor = None
+    futuros = {}
+    try:
+        for pdf_path in pdfs:
+            identidade = identidade_arquivo(pdf_path) if con is not None else None
+            indexado = None
+            if con is not None:
+                try:
+                    indexado = ler_textos(con, pdf_path, identidade)
+                except (sqlite3.Error, OSError) as e:
+                    # Segue sem índice: os PDFs restantes são lidos do arquivo
+                    avisar_indice(e)
+                    con.close()
+                    con = identidade = None
+            if indexado is not None:
+                # Já indexado: busca direto no texto gravado
+                acertos = []
+                for num_pagina, texto in enumerate(indexado):
+                    acertos.extend(acertos_pagina(texto, num_pagina, busca, com_trechos))
+                yield pdf_path, 1, acertos, True
+                continue
+            # Fora do índice: lido no pool, primeiro lote de até PAGINAS_POR_LOTE páginas
+            if executor is None:
+                executor = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                                               initializer=iniciar_processo_busca, initargs=(termos,))
+            futuros[executor.submit(buscar_termos_lote, pdf_path, 0, None, con is not None, com_trechos)] = pdf_path
+            lotes_pdf[pdf_path] = 1
+            if identidade is not None:
+                para_indexar[pdf_path] = (identidade, None)
+
+        while futuros:
+            prontos, _ = wait(futuros, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                if futuro not in futuros:
+                    continue  # Lote de um PDF que já falhou em outro lote desta mesma leva
+                pdf_path = futuros.pop(futuro)
+                try:
+                    total, inicio, fim, acertos, textos = futuro.result()
+                except Exception as e:
+                    print(f"[❌] Erro ao processar {pdf_path}: {e}")
+                    para_indexar.pop(pdf_path, None)
+                    del lotes_pdf[pdf_path]
+                    # Os demais lotes do mesmo PDF, se houver, são descartados
+                    for outro, p in list(futuros.items()):
+                        if p == pdf_path:
+                            outro.cancel()
+                            del futuros[outro]
+                    # PDF ilegível: gera só a parte que ainda não entrou no progresso, sem acertos
+                    yield pdf_path, 1 - fracao_gerada.pop(pdf_path, 0), [], True
+                    continue
+                if inicio == 0 and fim < total:
+                    # Primeiro lote de um PDF grande: o restante vai para os outros processos
+                    for a in range(fim, total, PAGINAS_POR_LOTE):
+                        futuros[executor.submit(buscar_termos_lote, pdf_path, a, min(total, a + PAGINAS_POR_LOTE),
+                                                con is not None, com_trechos)] = pdf_path
+                        lotes_pdf[pdf_path] += 1
+                lotes_pdf[pdf_path] -= 1
+                concluido = lotes_pdf[pdf_path] == 0
+                fracao = (fim - inicio) / total if total else 1
+                fracao_gerada[pdf_path] = fracao_gerada.get(pdf_path, 0) + fracao
+                if concluido:
+                    del lotes_pdf[pdf_path]
+                    del fracao_gerada[pdf_path]
+                if con is not None and pdf_path in para_indexar:
+                    identidade, textos_pdf_lotes = para_indexar[pdf_path]
+                    textos_pdf_lotes = textos_pdf_lotes or [None] * total
+                    textos_pdf_lotes[inicio:fim] = textos
+                    para_indexar[pdf_path] = (identidade, textos_pdf_lotes)
+                    if concluido:
+                        del para_indexar[pdf_path]
+                        try:
+                            gravar_textos(con, pdf_path, identidade, textos_pdf_lotes)
+                            con.commit()
+                        except (sqlite3.Error, OSError) as e:
+                            avisar_indice(e)
+                            con.close()
+                            con = None
+                # fracao é a parte do PDF coberta pelo lote; acertos vem de acertos_pagina (com trechos, se com_trechos)
+                yield pdf_path, fracao, acertos, concluido
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if con is not None:
+            con.close()
+
+
+def calcular_progresso(lidos, total):
+    """
+    Percentual inteiro (0 a 100) de PDFs lidos; lidos soma as frações de lotes de buscar_pdfs.
+    """
+    return int(round(lidos / total * 100, 6))  # A soma das frações de lotes não fecha exata
+
+
+def filtrar_pdfs(pdfs_por_pasta, termos, pasta_saida, fila, max_workers=None, caminho_indice=CAMINHO_INDICE_PADRAO):
+    """
+    Filtra as páginas que contêm cada termo (ver buscar_pdfs: cada página é lida uma única vez para
+    todos os termos, em paralelo e com o índice de caminho_indice); os PDFs de origem são abertos só
+    para copiar as páginas encontradas. Cada pasta de pdfs_por_pasta ({pasta: [pdf, ...]}) é gravada
+    assim que todos os seus PDFs terminam, um PDF por termo encontrado (ver nome_saida).
+    O progresso (0 a 100, pela fração de páginas lidas de cada PDF) vai para a fila e, ao final, "done".
+    """
+    total_pdfs = sum(len(arquivos) for arquivos in pdfs_por_pasta.values())
+    ordem = {pdf: posicao for arquivos in pdfs_por_pasta.values() for posicao, pdf in enumerate(arquivos)}
+    pasta_do_pdf = {pdf: pasta for pasta, arquivos in pdfs_por_pasta.items() for pdf in arquivos}
+    resultados = {pasta: defaultdict(list) for pasta in pdfs_por_pasta}
+    pdfs_pendentes = {pasta: len(arquivos) for pasta, arquivos in pdfs_por_pasta.items()}
+    lidos = 0.0
+    progresso_enviado = -1
+    try:
+        for pdf_path, fracao, acertos, concluido in buscar_pdfs(list(pasta_do_pdf), termos, max_workers, caminho_indice):
+            pasta = pasta_do_pdf[pdf_path]
+            for termo, num_pagina, _ in acertos:
+                resultados[pasta][termo].append((pdf_path, num_pagina))
+            lidos += fracao
+            progresso = calcular_progresso(lidos, total_pdfs)
+            if progresso != progresso_enviado:
+                fila.put(progresso)
+                progresso_enviado = progresso
+            if concluido:
+                pdfs_pendentes[pasta] -= 1
+                if pdfs_pendentes[pasta] == 0:
+                    gravar_pasta(pasta, resultados.pop(pasta), termos, pasta_saida, ordem)
+    except Exception as e:
+        print(f"[❌] Erro ao filtrar os PDFs: {e}")
+    finally:
+        # Sem o "done" a janela de progresso não fecha
+        fila.put("done")
+
+
+def pre_visualizar(pdfs, termos, fila, max_workers=None, caminho_indice=CAMINHO_INDICE_PADRAO):
+    """
+    Modo de pré-visualização: só mostra onde os termos aparecem, sem gravar nenhum PDF (ver buscar_pdfs).
+    Manda para a fila, conforme os lotes terminam, ('acertos', [(pdf, página, termo, trecho), ...]),
+    o progresso (0 a 100) e, ao final, "done". Os acertos escolhidos são gravados com exportar_acertos.
+    """
+    lidos = 0.0
+    progresso_enviado = -1
+    try:
+        for pdf_path, fracao, acertos, _ in buscar_pdfs(pdfs, termos, max_workers, caminho_indice, com_trechos=True):
+            if acertos:
+                fila.put(('acertos', [(pdf_path, num_pagina, termo, texto_trecho)
+                                      for termo, num_pagina, texto_trecho in sorted(acertos, key=lambda a: (a[1], a[0]))]))
+            lidos += fracao
+            progresso = calcular_progresso(lidos, len(pdfs))
+            if progresso != progresso_enviado:
+                fila.put(progresso)
+                progresso_enviado = progresso
+    except Exception as e:
+        print(f"[❌] Erro na pré-visualização: {e}")
+    finally:
+        fila.put("done")
+
+
+def exportar_acertos(acertos, caminho_saida):
+    """
+    Grava em um único PDF as páginas dos acertos escolhidos na pré-visualização ([(pdf, página, ...)]),
+    sem repetir páginas e na ordem recebida, copiando páginas contíguas juntas.
+    Retorna a quantidade de páginas gravadas.
+    """
+    paginas = list(dict.fromkeys((pdf_path, num_pagina) for pdf_path, num_pagina, *_ in acertos))
+    docs_abertos = OrderedDict()
+    try:
+        gravar_saida(paginas, caminho_saida, docs_abertos)
+    finally:
+        fechar_documentos(docs_abertos)
+    return len(paginas)
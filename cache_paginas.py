@@ -0,0 +1,155 @@
+import os
+import json
+import sqlite3
+import zlib
+from array import array
+
+
+# Tabelas que abrir_cache sabe criar; cada uma identifica o PDF por caminho + tamanho + mtime
+TABELAS = {
+    # Textos e impressões digitais das páginas (SEFIP)
+    'paginas': "CREATE TABLE IF NOT EXISTS paginas ("
+               " caminho TEXT PRIMARY KEY,"
+               " tamanho INTEGER NOT NULL,"
+               " mtime_ns INTEGER NOT NULL,"
+               " textos BLOB NOT NULL,"
+               " impressoes BLOB)",
+    # Tokens compactos do modo de memória limitada (sem o texto das páginas)
+    'tokens': "CREATE TABLE IF NOT EXISTS tokens ("
+              " caminho TEXT PRIMARY KEY,"
+              " tamanho INTEGER NOT NULL,"
+              " mtime_ns INTEGER NOT NULL,"
+              " dados BLOB NOT NULL)",
+    # Só o texto das páginas, para quem não usa impressões (ex.: índice do filtro de PDFs)
+    'textos': "CREATE TABLE IF NOT EXISTS textos ("
+              " caminho TEXT PRIMARY KEY,"
+              " tamanho INTEGER NOT NULL,"
+              " mtime_ns INTEGER NOT NULL,"
+              " textos BLOB NOT NULL)",
+}
+
+
+def abrir_cache(caminho_db, tabelas=('paginas', 'tokens')):
+    """
+    Abre (ou cria) o cache persistente de páginas em SQLite, criando só as tabelas pedidas (ver TABELAS).
+    Cada PDF é identificado por caminho + tamanho + mtime; se o arquivo mudar, a entrada é ignorada.
+    """
+    os.makedirs(os.path.dirname(caminho_db) or '.', exist_ok=True)
+    con = sqlite3.connect(caminho_db, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    for tabela in tabelas:
+        con.execute(TABELAS[tabela])
+    if 'paginas' in tabelas:
+        # Caches criados antes das impressões digitais não têm a coluna
+        colunas = {row[1] for row in con.execute("PRAGMA table_info(paginas)")}
+        if 'impressoes' not in colunas:
+            con.execute("ALTER TABLE paginas ADD COLUMN impressoes BLOB")
+    return con
+
+
+def identidade_arquivo(caminho):
+    """
+    Retorna (tamanho, mtime_ns) do arquivo, ou None se não for possível consultá-lo.
+    """
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+def possui_entrada(con, caminho, identidade, tabela='paginas'):
+    """
+    Indica se há entrada válida para o arquivo na tabela (ver TABELAS), sem ler o conteúdo.
+    """
+    if identidade is None:
+        return False
+    row = con.execute(
+        f"SELECT tamanho, mtime_ns FROM {tabela} WHERE caminho = ?", (caminho,)
+    ).fetchone()
+    return row is not None and (row[0], row[1]) == tuple(identidade)
+
+
+def ler_paginas(con, caminho, identidade):
+    """
+    Retorna (textos, impressoes) gravados para o arquivo, ou None se não houver entrada válida
+    para essa identidade. impressoes é None em entradas gravadas antes das impressões digitais.
+    """
+    if identidade is None:
+        return None
+    row = con.execute(
+        "SELECT tamanho, mtime_ns, textos, impressoes FROM paginas WHERE caminho = ?", (caminho,)
+    ).fetchone()
+    if row is None or (row[0], row[1]) != identidade:
+        return None
+    impressoes = array('Q', row[3]).tolist() if row[3] is not None else None
+    return json.loads(zlib.decompress(row[2])), impressoes
+
+
+def gravar_paginas(con, caminho, identidade, textos, impressoes):
+    """
+    Grava (ou substitui) os textos das páginas de um arquivo, comprimidos com zlib, e as
+    impressões digitais de cada página (inteiros de 64 bits).
+    """
+    if identidade is None:
+        return
+    blob = zlib.compress(json.dumps(textos, ensure_ascii=False).encode('utf-8'))
+    con.execute(
+        "INSERT OR REPLACE INTO paginas (caminho, tamanho, mtime_ns, textos, impressoes) VALUES (?, ?, ?, ?, ?)",
+        (caminho, identidade[0], identidade[1], blob, array('Q', impressoes).tobytes()),
+    )
+
+
+def ler_textos(con, caminho, identidade):
+    """
+    Retorna os textos gravados para o arquivo na tabela 'textos', ou None se não houver entrada
+    válida para essa identidade.
+    """
+    if identidade is None:
+        return None
+    row = con.execute(
+        "SELECT tamanho, mtime_ns, textos FROM textos WHERE caminho = ?", (caminho,)
+    ).fetchone()
+    if row is None or (row[0], row[1]) != identidade:
+        return None
+    return json.loads(zlib.decompress(row[2]))
+
+
+def gravar_textos(con, caminho, identidade, textos):
+    """
+    Grava (ou substitui) na tabela 'textos' os textos das páginas de um arquivo, comprimidos com zlib.
+    """
+    if identidade is None:
+        return
+    blob = zlib.compress(json.dumps(textos, ensure_ascii=False).encode('utf-8'))
+    con.execute(
+        "INSERT OR REPLACE INTO textos (caminho, tamanho, mtime_ns, textos) VALUES (?, ?, ?, ?)",
+        (caminho, identidade[0], identidade[1], blob),
+    )
+
+
+def ler_tokens(con, caminho, identidade):
+    """
+    Retorna os tokens serializados (bytes) gravados para o arquivo, ou None se não houver
+    entrada válida para essa identidade.
+    """
+    if identidade is None:
+        return None
+    row = con.execute(
+        "SELECT tamanho, mtime_ns, dados FROM tokens WHERE caminho = ?", (caminho,)
+    ).fetchone()
+    if row is None or (row[0], row[1]) != identidade:
+        return None
+    return row[2]
+
+
+def gravar_tokens(con, caminho, identidade, dados):
+    """
+    Grava (ou substitui) os tokens serializados de um arquivo.
+    """
+    if identidade is None:
+        return
+    con.execute(
+        "INSERT OR REPLACE INTO tokens (caminho, tamanho, mtime_ns, dados) VALUES (?, ?, ?, ?)",
+        (caminho, identidade[0], identidade[1], dados),
+    )
@@ -0,0 +1,45 @@
+import fitz  # PyMuPDF
+
+# Quantidade de PDFs de origem mantidos abertos ao montar as saídas
+LIMITE_DOCS_ABERTOS = 8
+
+
+def agrupar_intervalos(paginas):
+    """
+    Agrupa a lista [(pdf, página), ...] em intervalos contíguos do mesmo PDF, mantendo a ordem.
+    Retorna lista de tuplas (pdf, página_inicial, página_final).
+    """
+    intervalos = []
+    for p, i in paginas:
+        if intervalos and intervalos[-1][0] == p and intervalos[-1][2] == i - 1:
+            intervalos[-1] = (p, intervalos[-1][1], i)
+        else:
+            intervalos.append((p, i, i))
+    return intervalos
+
+
+def abrir_documento(docs_abertos, p, limite=LIMITE_DOCS_ABERTOS, origem=None):
+    """
+    Retorna o PDF de origem aberto, reaproveitando docs_abertos (OrderedDict usado como LRU).
+    Fecha o documento menos usado quando o limite é ultrapassado. origem(p), se informada, dá o
+    caminho de onde o arquivo é de fato lido (ex.: cópia local de sefip_pre_leitura).
+    """
+    doc = docs_abertos.get(p)
+    if doc is not None:
+        docs_abertos.move_to_end(p)
+        return doc
+    doc = fitz.open(origem(p) if origem is not None else p)
+    docs_abertos[p] = doc
+    if len(docs_abertos) > limite:
+        _, antigo = docs_abertos.popitem(last=False)
+        antigo.close()
+    return doc
+
+
+def fechar_documentos(docs_abertos):
+    """
+    Fecha todos os PDFs de origem mantidos abertos.
+    """
+    while docs_abertos:
+        _, doc = docs_abertos.popitem()
+        doc.close()
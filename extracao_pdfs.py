@@ -0,0 +1,44 @@
+from collections import deque
+from cache_paginas import identidade_arquivo
+from sefip_metricas import medir, somar, registrar_arquivo, executar_cronometrado
+
+
+def iterar_extracoes(pdfs, extrair, ler=None, gravar=None, executor=None, janela=1, metricas=None, mes=None,
+                     origem=None):
+    """
+    Gera (pdf_path, resultado) um PDF por vez, na ordem de pdfs, com resultado = extrair(caminho) rodando
+    no executor (no máximo janela PDFs em andamento) ou, sem executor, neste processo.
+    ler(p, identidade) devolve o resultado do cache ou None; gravar(p, identidade, resultado) guarda no cache.
+    """
+    if origem is None:
+        origem = lambda p: p
+    em_andamento = deque()
+
+    def concluir(p, identidade, resultado, futuro):
+        if futuro is None and resultado is not None:  # Veio do cache
+            return p, resultado
+        resultado, segundos = executar_cronometrado(extrair, origem(p)) if futuro is None else futuro.result()
+        # 'extracao' soma o tempo de trabalho de cada PDF dentro do pool, não o da fila
+        somar(metricas, 'extracao', segundos, 1, mes)
+        registrar_arquivo(metricas, 'extracao', p, segundos)
+        if resultado is not None and gravar is not None:  # PDF ilegível (None) não vai ao cache
+            with medir(metricas, 'gravacao_cache', mes):
+                gravar(p, identidade, resultado)
+        return p, resultado
+
+    for p in pdfs:
+        identidade = resultado = futuro = None
+        with medir(metricas, 'leitura_cache', mes):
+            if ler is not None:
+                identidade = identidade_arquivo(p)
+                resultado = ler(p, identidade)
+        if resultado is not None:
+            somar(metricas, 'acertos_cache', 0.0, 1, mes)
+        elif executor is not None:
+            futuro = executor.submit(executar_cronometrado, extrair, origem(p))
+        em_andamento.append((p, identidade, resultado, futuro))
+        while em_andamento and (len(em_andamento) > janela or em_andamento[0][3] is None):
+            yield concluir(*em_andamento.popleft())
+
+    while em_andamento:
+        yield concluir(*em_andamento.popleft())
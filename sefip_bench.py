@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import subprocess
+import threading
+import multiprocessing
+import fitz  # PyMuPDF for handling PDF files
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Variantes comparadas: as políticas de busca do motor usadas pelo Sefip2024 e pelo SefipV2
+VARIANTES = ('Sefip2024', 'SefipV2')
+
+
+def formatar_cnpj(cnpj):
+    """
+    Aplica a máscara XX.XXX.XXX/XXXX-XX.
+    """
+    return f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}"
+
+
+def gerar_corpus(pasta, meses=2, pdfs_por_mes=3, paginas_por_pdf=100, filiais=50, ano=2023, semente=1):
+    """
+    Gera um corpus SEFIP sintético em pasta/pdfs/<ano>/<MM_AAAA>/*.pdf e a planilha pasta/filiais.xlsx.
+    Cada página tem cabeçalho "COMP: MM/AAAA" ou "Comp. Apuração MM/AAAA" (algumas com outra competência)
+    e alguns CNPJs das filiais e de terceiros, com e sem máscara.
+    Retorna dict com a contagem de PDFs, páginas e filiais.
+    """
+    rnd = random.Random(semente)
+    shutil.rmtree(pasta, ignore_errors=True)
+    cnpjs = [f"{rnd.randint(10**7, 10**8 - 1)}{rnd.randint(1, 9999):04d}{rnd.randint(0, 99):02d}" for _ in range(filiais)]
+    total_paginas = 0
+    for mes in range(1, meses + 1):
+        pasta_mes = os.path.join(pasta, 'pdfs', str(ano), f"{mes:02d}_{ano}")
+        os.makedirs(pasta_mes)
+        for k in range(pdfs_por_mes):
+            doc = fitz.open()
+            for p in range(paginas_por_pdf):
+                if p % 13 == 0:
+                    comp = f"COMP: {12 if mes == 1 else mes - 1:02d}/{ano if mes > 1 else ano - 1}"
+                elif p % 2:
+                    comp = f"COMP: {mes:02d}/{ano}"
+                else:
+                    comp = f"Comp. Apuração {mes:02d}/{ano}"
+                linhas = [f"SEFIP - GFIP   {comp}   Folha {p + 1}"]
+                for _ in range(rnd.randint(1, 4)):
+                    cnpj = rnd.choice(cnpjs) if rnd.random() < 0.7 else f"{rnd.randint(10**13, 10**14 - 1)}"
+                    linhas.append(f"Empresa CNPJ: {formatar_cnpj(cnpj) if rnd.random() < 0.8 else cnpj}")
+                    linhas.append(f"PIS {rnd.randint(10**10, 10**11)}  Remuneração {rnd.random() * 10000:.2f}")
+                doc.new_page().insert_text((40, 60), "\n".join(linhas), fontsize=9)
+            doc.save(os.path.join(pasta_mes, f"sefip_{k:03d}.pdf"))
+            doc.close()
+            total_paginas += paginas_por_pdf
+    pd.DataFrame({
+        'Filial': list(range(1, filiais + 1)),
+        'cnpj': [formatar_cnpj(c) for c in cnpjs],
+    }).to_excel(os.path.join(pasta, 'filiais.xlsx'), index=False)
+    return {'meses': meses, 'pdfs': meses * pdfs_por_mes, 'paginas': total_paginas, 'filiais': filiais}
+
+
+def medir_pico_memoria(parar, resultado, intervalo=0.05):
+    """
+    Amostra o RSS deste processo somado ao dos filhos (pool de extração) até parar ser ativado.
+    """
+    processo = psutil.Process()
+    while not parar.is_set():
+        try:
+            rss = processo.memory_info().rss + sum(f.memory_info().rss for f in processo.children(recursive=True))
+        except psutil.Error:
+            continue
+        resultado['pico_rss'] = max(resultado['pico_rss'], rss)
+        parar.wait(intervalo)
+
+
+def executar_variante(variante, pasta_corpus, pasta_trabalho):
+    """
+    Roda uma variante sobre uma cópia da planilha e uma pasta de saída novas, cronometrando a
+    escrita dos PDFs de saída (montar_pdf). Roda em processo próprio (ver main).
+    """
+    import sefip_engine
+
+    excel = os.path.join(pasta_trabalho, 'filiais.xlsx')
+    destino = os.path.join(pasta_trabalho, 'saida')
+    shutil.rmtree(pasta_trabalho, ignore_errors=True)
+    os.makedirs(pasta_trabalho)
+    shutil.copy(os.path.join(pasta_corpus, 'filiais.xlsx'), excel)
+    base = os.path.join(pasta_corpus, 'pdfs')
+
+    escrita = {'segundos': 0.0, 'arquivos': 0}
+    montar_original = sefip_engine.montar_pdf
+
+    def montar_cronometrado(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return montar_original(*args, **kwargs)
+        finally:
+            escrita['segundos'] += time.perf_counter() - inicio
+            escrita['arquivos'] += 1
+
+    memoria = {'pico_rss': 0}
+    parar = threading.Event()
+    if psutil is not None:
+        threading.Thread(target=medir_pico_memoria, args=(parar, memoria), daemon=True).start()
+
+    inicio = time.perf_counter()
+    try:
+        sefip_engine.montar_pdf = montar_cronometrado
+        sefip_engine.processar_sefip(excel, base, destino, politica=sefip_engine.POLITICAS[variante.lower()])
+    finally:
+        total = time.perf_counter() - inicio
+        parar.set()
+
+    return {'variante': variante, 'segundos': round(total, 3), 'escrita_pdf_s': round(escrita['segundos'], 3),
+            'saidas': escrita['arquivos'],
+            'pico_rss_mb': round(memoria['pico_rss'] / 2**20, 1) if psutil is not None else None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do separador SEFIP (Sefip2024 x SefipV2) em um corpus sintético.")
+    parser.add_argument('--pasta', default=os.path.join(os.path.expanduser('~'), 'sefip_bench'),
+                        help="Pasta de trabalho (corpus, saídas e cache)")
+    parser.add_argument('--meses', type=int, default=2)
+    parser.add_argument('--pdfs', type=int, default=3, help="PDFs por mês")
+    parser.add_argument('--paginas', type=int, default=100, help="Páginas por PDF")
+    parser.add_argument('--filiais', type=int, default=50)
+    parser.add_argument('--repeticoes', type=int, default=2,
+                        help="Rodadas por variante; a primeira é com cache de páginas vazio, as demais com cache quente")
+    parser.add_argument('--variantes', default=','.join(VARIANTES))
+    parser.add_argument('--json', default=None, help="Grava os resultados neste arquivo")
+    parser.add_argument('--interno', nargs=2, metavar=('VARIANTE', 'TRABALHO'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    pasta_corpus = os.path.join(args.pasta, 'corpus')
+    if args.interno:
+        # Processo filho: uma rodada de uma variante, resultado em JSON no stdout
+        print(json.dumps(executar_variante(args.interno[0], pasta_corpus, args.interno[1])))
+        return 0
+
+    print("🧪 Gerando corpus sintético...")
+    corpus = gerar_corpus(pasta_corpus, args.meses, args.pdfs, args.paginas, args.filiais)
+    linhas = corpus['filiais'] * corpus['meses']
+    print(f"   {corpus['pdfs']} PDFs, {corpus['paginas']} páginas, {corpus['filiais']} filiais x {corpus['meses']} meses")
+
+    resultados = []
+    for variante in args.variantes.split(','):
+        # Cada variante começa com o cache de páginas vazio; o cache fica na pasta de trabalho
+        pasta_cache = os.path.join(args.pasta, 'cache', variante)
+        shutil.rmtree(pasta_cache, ignore_errors=True)
+        ambiente = dict(os.environ, LOCALAPPDATA=pasta_cache)
+        for rodada in range(args.repeticoes):
+            saida = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--pasta', args.pasta,
+                 '--interno', variante, os.path.join(args.pasta, 'trabalho', variante)],
+                env=ambiente, capture_output=True, text=True, check=True,
+            )
+            r = json.loads(saida.stdout.strip().splitlines()[-1])
+            r['cache'] = 'frio' if rodada == 0 else 'quente'
+            r['paginas_s'] = round(corpus['paginas'] / r['segundos'], 1)
+            r['linhas_s'] = round(linhas / r['segundos'], 1)
+            resultados.append(r)
+            print(f"{variante:10s} cache {r['cache']:6s} {r['segundos']:8.2f} s  {r['paginas_s']:9.1f} páginas/s  "
+                  f"{r['linhas_s']:8.1f} linhas/s  escrita PDF {r['escrita_pdf_s']:6.2f} s  "
+                  f"pico RSS {r['pico_rss_mb'] if r['pico_rss_mb'] is not None else '--'} MB")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'corpus': corpus, 'resultados': resultados}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
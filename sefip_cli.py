@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import multiprocessing
+from sefip_engine import processar_sefip, CAMINHO_CACHE_PADRAO, POLITICAS, PRE_LEITURA_MB_PADRAO
+
+# Intervalo mínimo entre duas linhas de progresso no log
+INTERVALO_PROGRESSO = 5.0
+
+
+class FormatoJson(logging.Formatter):
+    """
+    Uma linha JSON por registro, com os campos estruturados enviados pelo motor.
+    """
+    def format(self, record):
+        registro = {'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'), 'nivel': record.levelname.lower(),
+                    'msg': record.getMessage()}
+        registro.update(getattr(record, 'campos', {}))
+        return json.dumps(registro, ensure_ascii=False)
+
+
+def configurar_log(formato, arquivo=None):
+    """
+    Configura o logger 'sefip' para texto legível ou JSON, no stderr e opcionalmente em arquivo.
+    """
+    logger = logging.getLogger('sefip')
+    logger.setLevel(logging.INFO)
+    fmt = FormatoJson() if formato == 'json' else logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+    destinos = [logging.StreamHandler(sys.stderr)]
+    if arquivo:
+        destinos.append(logging.FileHandler(arquivo, encoding='utf-8'))
+    for handler in destinos:
+        handler.setFormatter(fmt)
+        logger.addHandler(handler)
+    return logger
+
+
+def criar_notificador(logger):
+    """
+    Traduz os eventos do motor para o logger; o progresso é registrado no máximo a cada INTERVALO_PROGRESSO segundos.
+    """
+    progresso = {'feito': 0, 'total': 0, 'ultimo': 0.0}
+
+    def notificar(evento, **dados):
+        if evento == 'log':
+            texto = dados.pop('texto')
+            nivel = dados.pop('nivel', 'info')
+            logger.log(logging.getLevelName(nivel.upper()), texto, extra={'campos': dados})
+        elif evento == 'configure':
+            progresso['total'] = dados['maximum']
+        elif evento == 'step':
+            progresso['feito'] += dados['value']
+            agora = time.time()
+            if agora - progresso['ultimo'] >= INTERVALO_PROGRESSO or progresso['feito'] >= progresso['total']:
+                progresso['ultimo'] = agora
+                decorrido = agora - dados['start']
+                eta = decorrido / progresso['feito'] * (progresso['total'] - progresso['feito'])
+                logger.info(f"⏳ {progresso['feito']}/{progresso['total']} - ETA {int(eta // 60)}m {int(eta % 60)}s",
+                            extra={'campos': {'feito': progresso['feito'], 'total': progresso['total'],
+                                              'eta_s': round(eta, 1)}})
+
+    return notificar
+
+
+def lista_inteiros(valor):
+    """
+    Converte '1,2,12' em {1, 2, 12}.
+    """
+    return {int(v) for v in valor.split(',') if v.strip()}
+
+
+def lista_textos(valor):
+    """
+    Converte '2023,2024' em {'2023', '2024'}.
+    """
+    return {v.strip() for v in valor.split(',') if v.strip()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Separa as páginas SEFIP por filial sem abrir a interface.")
+    parser.add_argument('--excel', required=True, help="Planilha com as colunas Filial e cnpj")
+    parser.add_argument('--base', required=True, help="Pasta base com <ano>/<MM_AAAA>/*.pdf")
+    parser.add_argument('--destino', required=True, help="Pasta de saída")
+    parser.add_argument('--politica', choices=sorted(POLITICAS), default='sefip2024',
+                        help="Regras de busca: sefip2024 (competência da pasta e raiz do CNPJ) ou sefipv2 (qualquer competência, CNPJ completo)")
+    parser.add_argument('--workers', type=int, default=None, help="Processos de extração de texto (padrão: núcleos da CPU)")
+    parser.add_argument('--meses-simultaneos', type=int, default=1,
+                        help="Pastas mês processadas ao mesmo tempo, cada uma em um processo (padrão: 1)")
+    parser.add_argument('--anos', type=lista_textos, default=None, help="Anos a processar, ex.: 2023,2024")
+    parser.add_argument('--meses', type=lista_inteiros, default=None, help="Meses a processar, ex.: 1,2,12")
+    parser.add_argument('--cache', default=CAMINHO_CACHE_PADRAO, help="Arquivo do cache de páginas")
+    parser.add_argument('--limite-memoria-mb', type=int, default=None,
+                        help="Modo de memória limitada: não guarda o texto das páginas e transborda o índice para disco acima deste RSS")
+    parser.add_argument('--pre-leitura-mb', type=int, default=PRE_LEITURA_MB_PADRAO,
+                        help="Espaço local para copiar os PDFs do próximo mês enquanto o atual é processado (0 desativa)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Meses já processados que só ganharam PDFs: lê apenas os PDFs novos e acrescenta as páginas às saídas existentes")
+    parser.add_argument('--pdf-garbage', type=int, choices=range(5), default=0,
+                        help="Limpeza de objetos ao salvar cada PDF de saída (0 a 4, como o garbage do PyMuPDF)")
+    parser.add_argument('--pdf-deflate', action='store_true', help="Comprime os fluxos dos PDFs de saída")
+    parser.add_argument('--resumo', default=None, help="Grava o resumo da execução em JSON neste arquivo")
+    parser.add_argument('--metricas', default=None,
+                        help="Arquivo JSON das métricas por etapa (padrão: .sefip_metricas.json na pasta destino)")
+    parser.add_argument('--perfil', default=None, help="Roda sob cProfile e grava as estatísticas (pstats) neste arquivo")
+    parser.add_argument('--log-formato', choices=('texto', 'json'), default='texto')
+    parser.add_argument('--log-arquivo', default=None, help="Também grava o log neste arquivo")
+    args = parser.parse_args(argv)
+
+    logger = configurar_log(args.log_formato, args.log_arquivo)
+    opcoes_pdf = {'garbage': args.pdf_garbage, 'deflate': args.pdf_deflate}
+    try:
+        resumo = processar_sefip(args.excel, args.base, args.destino, criar_notificador(logger),
+                                 max_workers=args.workers, anos=args.anos, meses=args.meses,
+                                 caminho_cache=args.cache, limite_memoria_mb=args.limite_memoria_mb,
+                                 meses_simultaneos=args.meses_simultaneos, politica=POLITICAS[args.politica],
+                                 caminho_metricas=args.metricas, caminho_perfil=args.perfil,
+                                 pre_leitura_mb=args.pre_leitura_mb, incremental=args.incremental,
+                                 opcoes_pdf=opcoes_pdf)
+        codigo = 0
+    except Exception as e:
+        logger.exception(f"❌ Erro: {e}")
+        resumo = {'erro': str(e)}
+        codigo = 1
+
+    if args.resumo:
+        os.makedirs(os.path.dirname(os.path.abspath(args.resumo)), exist_ok=True)
+        with open(args.resumo, 'w', encoding='utf-8') as f:
+            json.dump(resumo, f, ensure_ascii=False, indent=2)
+    return codigo
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,664 @@
+import os
+import time
+import cProfile
+import threading
+import numpy as np
+import pandas as pd
+import fitz  # PyMuPDF for handling PDF files
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import closing
+from cache_paginas import abrir_cache, ler_paginas, gravar_paginas, possui_entrada
+from documentos_pdf import agrupar_intervalos, abrir_documento, fechar_documentos
+from extracao_pdfs import iterar_extracoes
+from sefip_tokens import tokenizar_pagina, impressao_pagina, limpar_cnpj
+from sefip_status import carregar_diario, abrir_diario, registrar_status, gravar_status_excel, caminho_diario
+from sefip_status import carregar_manifesto, salvar_mes, carregar_impressoes, filiais_registradas, registrar_mes
+from sefip_status import arquivos_novos, filiais_do_mes
+from sefip_indice import iterar_tokens_pdfs, indexar_tokens, buscar_paginas_tokens, fechar_indice
+from sefip_pre_leitura import iniciar_pre_leitura, agendar_pre_leitura, caminho_local, liberar_pre_leitura, encerrar_pre_leitura
+from sefip_metricas import (criar_metricas, medir, somar, registrar_arquivo, cronometrar_iteravel,
+                            mesclar_metricas, resumir_metricas, salvar_metricas)
+
+# Cache local (fora do drive de rede) reaproveitado entre execuções
+CAMINHO_CACHE_PADRAO = os.path.join(
+    os.environ.get('LOCALAPPDATA') or os.path.expanduser('~'), 'SEFIP', 'cache_paginas.sqlite3'
+)
+
+# Espaço local máximo para as cópias da pré-leitura da próxima pasta mês (0 desativa)
+PRE_LEITURA_MB_PADRAO = 1024
+
+# Regras de correspondência entre filial e página:
+#   competencia_da_pasta: só páginas com a competência da pasta mês (senão, qualquer competência,
+#                         e cada competência encontrada gera o seu SEFIP - MM.pdf)
+#   raiz: também aceita páginas que só trazem a raiz (8 primeiros dígitos) do CNPJ
+PoliticaBusca = namedtuple('PoliticaBusca', 'competencia_da_pasta raiz')
+POLITICAS = {
+    'sefip2024': PoliticaBusca(competencia_da_pasta=True, raiz=True),
+    'sefipv2': PoliticaBusca(competencia_da_pasta=False, raiz=False),
+}
+
+# Páginas de um PDF: textos e impressões digitais (sefip_tokens.impressao_pagina), na mesma ordem
+PaginasPdf = namedtuple('PaginasPdf', 'textos impressoes')
+
+# Filiais com saídas aguardando o escritor antes de a busca parar para esperar (ver processar_mes)
+LIMITE_ESCRITAS_PENDENTES = 32
+
+# O PyMuPDF não pode ser usado por duas threads ao mesmo tempo: o escritor e a busca se revezam nesta trava
+TRAVA_FITZ = threading.Lock()
+
+# Status de uma filial cuja saída não pôde ser gravada (volta a ser processada na próxima execução)
+STATUS_ERRO_GRAVACAO = 'Erro na gravação'
+
+
+def coletar_pastas(pasta_base, anos=None, meses=None):
+    """
+    Retorna lista de tuplas (ano, mes_str, caminho_pasta) para todas pastas mês existentes.
+    anos (ex.: {'2023'}) e meses (ex.: {1, 2}) restringem as pastas consideradas.
+    """
+    pastas = []
+    for ano in os.listdir(pasta_base):
+        dir_ano = os.path.join(pasta_base, ano)
+        if not os.path.isdir(dir_ano) or (anos and ano not in anos):
+            continue
+        for mes in range(1, 13):
+            if meses and mes not in meses:
+                continue
+            mes_str = f"{mes:02d}_{ano}"
+            path = os.path.join(dir_ano, mes_str)
+            if os.path.isdir(path):
+                pastas.append((ano, mes_str, path))
+    return pastas
+
+
+def listar_pdfs(pasta):
+    """
+    Lista os PDFs da pasta com a identidade (tamanho, mtime_ns) de cada um usando os.scandir
+    (no Windows o stat vem junto da listagem, sem nova consulta ao servidor).
+    Retorna dict: {pdf_path: (tamanho, mtime_ns)}, na ordem da listagem.
+    """
+    arquivos = {}
+    with os.scandir(pasta) as entradas:
+        for entrada in entradas:
+            if entrada.name.lower().endswith('.pdf'):
+                st = entrada.stat()
+                arquivos[entrada.path] = (st.st_size, st.st_mtime_ns)
+    return arquivos
+
+
+def extrair_paginas_pdf(p):
+    """
+    Lê o texto de todas as páginas de um PDF e calcula a impressão digital de cada uma.
+    Roda dentro dos processos do pool, por isso fica no nível do módulo e devolve só tipos simples.
+    Retorna PaginasPdf, ou None se o PDF não pôde ser lido (para não ir ao cache).
+    """
+    try:
+        with fitz.open(p) as doc:
+            textos = [page.get_text() or "" for page in doc]
+    except Exception:
+        return None
+    return PaginasPdf(textos, [impressao_pagina(t) for t in textos])
+
+
+def criar_pool_extracao(max_workers=None):
+    """
+    Cria o pool de processos usado na extração. Deve ser criado uma vez por execução
+    e reaproveitado entre as pastas mês (abrir processos no Windows é caro).
+    """
+    return ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1)
+
+
+def iterar_textos_pdfs(pdfs, executor=None, cache=None, metricas=None, mes=None, origem=None, janela=1):
+    """
+    Gera (pdf_path, PaginasPdf) um PDF por vez, na ordem de pdfs, lendo do cache (conexão de cache_paginas)
+    ou extraindo no executor; janela, metricas e origem como em extracao_pdfs.iterar_extracoes.
+    """
+    def ler(p, identidade):
+        paginas = ler_paginas(cache, p, identidade)
+        if paginas is None or paginas[1] is not None:
+            return PaginasPdf(*paginas) if paginas is not None else None
+        # Entrada antiga do cache, sem impressões: calcula aqui e regrava
+        paginas = PaginasPdf(paginas[0], [impressao_pagina(t) for t in paginas[0]])
+        gravar(p, identidade, paginas)
+        return paginas
+
+    def gravar(p, identidade, paginas):
+        gravar_paginas(cache, p, identidade, paginas.textos, paginas.impressoes)
+        cache.commit()
+
+    if cache is None:
+        ler = gravar = None
+    for p, paginas in iterar_extracoes(pdfs, extrair_paginas_pdf, ler, gravar, executor, janela, metricas, mes, origem):
+        yield p, paginas if paginas is not None else PaginasPdf([], [])
+
+
+def montar_pdf(paginas, out, docs_abertos=None, origem=None, opcoes_pdf=None):
+    """
+    Monta e salva um PDF com as páginas [(pdf, página), ...], abrindo cada origem uma vez
+    e copiando cada intervalo contíguo com um único insert_pdf.
+    Retorna lista de erros (pdf, página_inicial, página_final, exceção); um intervalo com erro não impede os demais.
+    origem como em iterar_textos_pdfs. opcoes_pdf (ex.: {'garbage': 3, 'deflate': True}) vai para o save.
+    """
+    proprio = docs_abertos is None
+    if proprio:
+        docs_abertos = OrderedDict()
+    erros = []
+    novo = fitz.open()
+    try:
+        for p, inicio, fim in agrupar_intervalos(paginas):
+            try:
+                novo.insert_pdf(abrir_documento(docs_abertos, p, origem=origem), from_page=inicio, to_page=fim)
+            except Exception as e:
+                erros.append((p, inicio, fim, e))
+        novo.save(out, **(opcoes_pdf or {}))
+    finally:
+        novo.close()
+        if proprio:
+            fechar_documentos(docs_abertos)
+    return erros
+
+
+def anexar_pdf(paginas, out, docs_abertos=None, origem=None, opcoes_pdf=None):
+    """
+    Acrescenta as páginas [(pdf, página), ...] ao final do PDF de saída existente (ou o cria com
+    montar_pdf, se ainda não existe). Sempre que o PyMuPDF permite, grava de forma incremental,
+    só acrescentando ao arquivo (opcoes_pdf não se aplica); senão, salva uma cópia completa com
+    opcoes_pdf e a troca com os.replace. Retorna lista de erros como montar_pdf.
+    """
+    if not os.path.exists(out):
+        return montar_pdf(paginas, out, docs_abertos, origem, opcoes_pdf)
+    proprio = docs_abertos is None
+    if proprio:
+        docs_abertos = OrderedDict()
+    erros = []
+    doc = fitz.open(out)
+    substituir = False
+    try:
+        for p, inicio, fim in agrupar_intervalos(paginas):
+            try:
+                doc.insert_pdf(abrir_documento(docs_abertos, p, origem=origem), from_page=inicio, to_page=fim)
+            except Exception as e:
+                erros.append((p, inicio, fim, e))
+        if doc.can_save_incrementally():
+            doc.saveIncr()
+        else:
+            doc.save(out + '.tmp', **(opcoes_pdf or {}))
+            substituir = True
+    finally:
+        doc.close()
+        if proprio:
+            fechar_documentos(docs_abertos)
+    if substituir:
+        os.replace(out + '.tmp', out)
+    return erros
+
+
+def impressoes_saida(out):
+    """
+    Impressões digitais das páginas de um PDF de saída já gravado (vazio se não existe). Usado no
+    modo incremental quando o arquivo de impressões do mês não tem as da saída.
+    """
+    if not os.path.exists(out):
+        return []
+    with TRAVA_FITZ, fitz.open(out) as doc:
+        return [impressao_pagina(page.get_text() or "") for page in doc]
+
+
+def gravar_filial(pasta_filial, grupos, incremental, docs_abertos, origem=None, opcoes_pdf=None):
+    """
+    Trabalho do escritor (ver processar_mes): grava as saídas de uma filial, uma por grupo
+    {comp: (saida, [(pdf, página), ...], impressões, vistas)}, anexando às existentes (incremental)
+    ou montando cada PDF. Uma saída que não pôde ser gravada não impede as demais.
+    Retorna lista de (mes_comp, saida, paginas, erros, segundos, falha) na ordem de grupos;
+    falha é a exceção da gravação ou None.
+    """
+    registros = []
+    with TRAVA_FITZ:
+        for (_, mes_comp), (out, paginas, _, _) in grupos.items():
+            inicio = time.perf_counter()
+            falha = None
+            erros = []
+            try:
+                os.makedirs(pasta_filial, exist_ok=True)
+                if incremental:
+                    erros = anexar_pdf(paginas, out, docs_abertos, origem, opcoes_pdf)
+                else:
+                    erros = montar_pdf(paginas, out, docs_abertos, origem, opcoes_pdf)
+            except Exception as e:
+                falha = e
+            registros.append((mes_comp, out, len(paginas), erros, time.perf_counter() - inicio, falha))
+    return registros
+
+
+def indexar_paginas(documentos, mes_str, politica):
+    """
+    Monta o índice invertido do mês em uma única passada pelas páginas. Com politica.competencia_da_pasta,
+    só entram as páginas cuja competência coincide com a pasta (mes_str no formato MM_AAAA); senão,
+    qualquer página com competência. Raízes só são indexadas com politica.raiz.
+    documentos: iterável de (pdf, PaginasPdf); o texto de cada PDF é descartado logo após ser indexado.
+    Retorna dict: {'cnpj': {cnpj14: [(pdf, página), ...]}, 'raiz': {raiz8: [...]},
+                   'pagina': {(pdf, página): (impressão_digital, (ano, mes))}, 'ordem': {pdf: posição}}
+    """
+    indice = {'cnpj': {}, 'raiz': {}, 'pagina': {}, 'ordem': {}}
+    comp_pasta = (mes_str[:2], mes_str[3:])
+    for ordem, (p, paginas) in enumerate(documentos):
+        indice['ordem'][p] = ordem
+        for i, texto_pagina in enumerate(paginas.textos):
+            registro = tokenizar_pagina(texto_pagina)
+            if not registro.mes or (politica.competencia_da_pasta and (registro.mes, registro.ano) != comp_pasta):
+                continue
+            indice['pagina'][(p, i)] = (paginas.impressoes[i], (registro.ano, registro.mes))
+            for cnpj in registro.cnpjs:
+                indice['cnpj'].setdefault(cnpj, []).append((p, i))
+            if politica.raiz:
+                for raiz in registro.raizes:
+                    indice['raiz'].setdefault(raiz, []).append((p, i))
+    return indice
+
+
+def buscar_paginas(indice, cnpj_limpo):
+    """
+    Retorna as páginas [(pdf, página, impressão, (ano, mes))] do CNPJ completo ou da sua raiz, na ordem dos PDFs.
+    """
+    encontradas = set(indice['cnpj'].get(cnpj_limpo, ()))
+    encontradas.update(indice['raiz'].get(cnpj_limpo[:8], ()))
+    return [(p, i) + indice['pagina'][(p, i)]
+            for p, i in sorted(encontradas, key=lambda hit: (indice['ordem'][hit[0]], hit[1]))]
+
+
+def processar_mes(ano_pasta, mes_str_pasta, pdfs, pendentes, pasta_destino, notificar, politica, pool_extracao=None,
+                  cache=None, limite_memoria_mb=None, pause_event=None, metricas=None, origem=None, pdfs_novos=None,
+                  opcoes_pdf=None, janela_extracao=1):
+    """
+    Processa as filiais pendentes [(idx, filial, cnpj_limpo, anterior)] de uma pasta mês, gerando
+    Filial - X/<ano>/SEFIP - MM.pdf conforme a politica. Gera (idx, status, saidas, paginas, erros, impressoes)
+    por filial, na ordem de pendentes, depois de gravadas as suas saídas.
+    """
+    def log(texto, nivel='info', **campos):
+        notificar('log', texto=texto, nivel=nivel, **campos)
+
+    def concluir(idx, filial, anterior, grupos, futuro):
+        # Resultado de uma filial; com saídas a gravar, espera o escritor terminar as dela
+        if futuro is None:
+            if anterior is not None:
+                # Nada novo para a filial: saídas e status continuam os do manifesto
+                return idx, anterior['status'], anterior['saidas'], 0, 0, {}
+            log(f"{filial} - {ano_pasta}/{mes_str_pasta[:2]} - Não encontrado.",
+                mes=mes_str_pasta, filial=filial, status='Não encontrado')
+            return idx, 'Não encontrado', [], 0, 0, {}
+        with medir(metricas, 'espera_escrita', mes_str_pasta):
+            registros = futuro.result()
+        status = 'Concluído'
+        saidas = list(anterior['saidas']) if anterior is not None else []
+        impressoes = {}
+        total_paginas = 0
+        total_erros = 0
+        for (mes_comp, out, paginas, erros, segundos, falha), grupo in zip(registros, grupos.values()):
+            somar(metricas, 'escrita', segundos, 1, mes_str_pasta)
+            registrar_arquivo(metricas, 'escrita', out, segundos)
+            if falha is not None:
+                log(f"❌ {filial} - {ano_pasta}/{mes_comp} - Erro ao gravar {os.path.basename(out)}: {falha}",
+                    nivel='error', mes=mes_str_pasta, filial=filial, status=STATUS_ERRO_GRAVACAO, saida=out)
+                status = STATUS_ERRO_GRAVACAO
+                continue
+            for p_original_path, inicio, fim, page_err in erros:
+                # Se um intervalo falhar, os outros já foram inseridos
+                log(f"⚠️ Erro ao inserir páginas {inicio}-{fim} de {os.path.basename(p_original_path)}: {page_err}",
+                    nivel='warning', mes=mes_str_pasta, filial=filial, pdf=p_original_path)
+            if anterior is not None:
+                log(f"{filial} - {ano_pasta}/{mes_comp} - OK. Páginas novas anexadas: {paginas}",
+                    mes=mes_str_pasta, filial=filial, status='Concluído', paginas=paginas)
+            else:
+                log(f"{filial} - {ano_pasta}/{mes_comp} - OK. Páginas extraídas: {paginas}",
+                    mes=mes_str_pasta, filial=filial, status='Concluído', paginas=paginas)
+            saida = os.path.relpath(out, pasta_destino)
+            if saida not in saidas:
+                saidas.append(saida)
+            impressoes[saida] = grupo[2]
+            total_paginas += paginas
+            total_erros += len(erros)
+        return idx, status, saidas, total_paginas, total_erros, impressoes
+
+    # A gravação dos PDFs roda numa thread escritora enquanto a busca segue para as próximas filiais
+    # (até LIMITE_ESCRITAS_PENDENTES na fila); os PDFs de origem abertos só são usados por ela
+    docs_abertos = OrderedDict()
+    escritor = ThreadPoolExecutor(max_workers=1)
+    em_andamento = deque()
+    indice = None
+    try:
+        # Passada única pelas páginas do mês: só o índice fica em memória, não os textos.
+        # 'leitura_pdfs' é a espera pelos PDFs (cache ou pool); o restante da indexação é 'tokenizacao'
+        leitura = criar_metricas()
+        inicio = time.perf_counter()
+        if limite_memoria_mb:
+            documentos = iterar_tokens_pdfs(pdfs, pool_extracao, cache, metricas, mes_str_pasta, origem, janela_extracao)
+            indice = indexar_tokens(cronometrar_iteravel(documentos, leitura, 'leitura_pdfs'),
+                                    mes_str_pasta, politica, limite_memoria_mb)
+            if indice['disco'] is not None:
+                log(f"💽 Índice de {mes_str_pasta} transbordado para disco (limite de {limite_memoria_mb} MB)",
+                    mes=mes_str_pasta)
+            buscar = buscar_paginas_tokens
+        else:
+            documentos = iterar_textos_pdfs(pdfs, pool_extracao, cache, metricas, mes_str_pasta, origem, janela_extracao)
+            indice = indexar_paginas(cronometrar_iteravel(documentos, leitura, 'leitura_pdfs'), mes_str_pasta, politica)
+            buscar = buscar_paginas
+        espera = leitura['etapas'].get('leitura_pdfs', {}).get('segundos', 0.0)
+        somar(metricas, 'leitura_pdfs', espera, len(pdfs), mes_str_pasta)
+        somar(metricas, 'tokenizacao', time.perf_counter() - inicio - espera, len(pdfs), mes_str_pasta)
+
+        # Impressões das páginas já nas saídas, para o modo incremental não repetir páginas
+        impressoes_mes = {}
+        if any(anterior is not None for *_, anterior in pendentes):
+            impressoes_mes = carregar_impressoes(pasta_destino, mes_str_pasta)
+
+        for idx, filial, cnpj_limpo_excel, anterior in pendentes:
+            while pause_event is not None and pause_event.is_set():
+                time.sleep(0.1)
+
+            pasta_filial = os.path.join(pasta_destino, f"Filial - {filial}", ano_pasta)
+            # Modo incremental: anterior é o registro da filial no manifesto ({'status', 'saidas'})
+            # e só contam as páginas dos pdfs_novos, acrescentadas às saídas existentes
+
+            # Consulta o índice: CNPJ completo e, como alternativa, a raiz (8 primeiros dígitos);
+            # as páginas são agrupadas por competência, sem repetir conteúdo dentro de cada grupo
+            # (nem, no modo incremental, o que já está na saída existente)
+            grupos = {}
+            with medir(metricas, 'busca', mes_str_pasta):
+                for p_path, i, impressao, comp in buscar(indice, cnpj_limpo_excel):
+                    if anterior is not None and p_path not in pdfs_novos:
+                        continue
+                    grupo = grupos.get(comp)
+                    if grupo is None:
+                        # Impressões já na saída: as do manifesto ou, se ele não as tem, lidas do PDF
+                        out = os.path.join(pasta_filial, f"SEFIP - {comp[1]}.pdf")
+                        saida = os.path.relpath(out, pasta_destino)
+                        existentes = list(impressoes_mes[saida] if saida in impressoes_mes else
+                                          impressoes_saida(out) if anterior is not None else ())
+                        grupo = grupos[comp] = (out, [], existentes, set(existentes))
+                    if impressao not in grupo[3]:
+                        grupo[1].append((p_path, i))
+                        grupo[2].append(impressao)
+                        grupo[3].add(impressao)
+            grupos = {comp: grupo for comp, grupo in grupos.items() if grupo[1]}
+
+            # Se encontrou UMA OU MAIS páginas para o CNPJ, as saídas vão para o escritor
+            futuro = None
+            if grupos:
+                futuro = escritor.submit(gravar_filial, pasta_filial, grupos, anterior is not None, docs_abertos,
+                                         origem, opcoes_pdf)
+            em_andamento.append((idx, filial, anterior, grupos, futuro))
+            while em_andamento and (len(em_andamento) > LIMITE_ESCRITAS_PENDENTES or
+                                    em_andamento[0][4] is None or em_andamento[0][4].done()):
+                yield concluir(*em_andamento.popleft())
+
+        while em_andamento:
+            yield concluir(*em_andamento.popleft())
+    finally:
+        escritor.shutdown(wait=True, cancel_futures=True)
+        fechar_documentos(docs_abertos)
+        if indice is not None and limite_memoria_mb:
+            fechar_indice(indice)
+
+
+def processar_mes_isolado(ano_pasta, mes_str_pasta, pdfs, pendentes, pasta_destino, politica, caminho_cache,
+                          limite_memoria_mb=None, pdfs_novos=None, opcoes_pdf=None):
+    """
+    processar_mes dentro de um processo do pool de meses (ver processar_sefip com meses_simultaneos).
+    A extração roda neste processo, com conexão própria ao cache.
+    Retorna (resultados, eventos, metricas): a lista gerada por processar_mes, os eventos de notificar
+    e as métricas do mês, repassados ao processo principal quando o mês termina.
+    """
+    eventos = []
+    metricas = criar_metricas()
+    cache = abrir_cache(caminho_cache)
+    try:
+        resultados = list(processar_mes(ano_pasta, mes_str_pasta, pdfs, pendentes, pasta_destino,
+                                        lambda evento, **dados: eventos.append((evento, dados)), politica,
+                                        cache=cache, limite_memoria_mb=limite_memoria_mb, metricas=metricas,
+                                        pdfs_novos=pdfs_novos, opcoes_pdf=opcoes_pdf))
+    finally:
+        cache.close()
+    return resultados, eventos, metricas
+
+
+def processar_sefip(caminho_excel, pasta_pdf_base, pasta_destino, notificar=None, pause_event=None,
+                    max_workers=None, anos=None, meses=None, caminho_cache=CAMINHO_CACHE_PADRAO,
+                    limite_memoria_mb=None, meses_simultaneos=1, politica=None, caminho_metricas=None,
+                    caminho_perfil=None, pre_leitura_mb=PRE_LEITURA_MB_PADRAO, incremental=False, opcoes_pdf=None):
+    """
+    Separa as páginas SEFIP de cada filial da planilha em Filial - X/<ano>/SEFIP - MM.pdf, conforme a politica
+    (padrão POLITICAS['sefip2024']). O andamento vai para notificar(evento, **dados): 'status' (texto), 'log'
+    (texto, nivel e campos), 'configure' (maximum) e 'step' (value, start). Retorna dict com o resumo da execução.
+    """
+    if notificar is None:
+        notificar = lambda evento, **dados: None
+    if politica is None:
+        politica = POLITICAS['sefip2024']
+
+    def log(texto, nivel='info', **campos):
+        notificar('log', texto=texto, nivel=nivel, **campos)
+
+    resumo = {'inicio': time.strftime('%Y-%m-%d %H:%M:%S'), 'pendentes': 0, 'incrementais': 0, 'concluidos': 0,
+              'nao_encontrados': 0, 'erros_gravacao': 0, 'erros_paginas': 0, 'meses': {}}
+    start_time = time.time()
+    metricas = criar_metricas()
+    perfil = cProfile.Profile() if caminho_perfil else None
+    if perfil is not None:
+        perfil.enable()
+    pool_extracao = None
+    pool_meses = None
+    pre_leitura = None
+    cache = None
+    diario = None
+    alteracoes = {}
+    try:
+        os.makedirs(pasta_destino, exist_ok=True)
+        notificar('status', texto="📚 Lendo lista de CNPJs...")
+        log("📚 Lendo lista de CNPJs...")
+
+        # Carrega Excel
+        with medir(metricas, 'leitura_excel'):
+            df = pd.read_excel(caminho_excel)
+        # Lista de filiais em colunas NumPy, preparada uma única vez (sem iterar linhas do DataFrame).
+        # limpar_cnpj (bytes.translate) deixa só os dígitos; CNPJs lidos como número perdem os zeros à esquerda
+        cnpjs_serie = df['cnpj'].astype(str).map(limpar_cnpj).str.zfill(14)
+        cnpjs_limpos_para_buscar = cnpjs_serie.to_numpy(dtype=str)
+        filiais = df['Filial'].astype(str).to_numpy(dtype=str)
+
+        # Identifica cada filial no diário e no manifesto pela filial + CNPJ
+        chaves_filiais = (df['Filial'].astype(str) + '|' + cnpjs_serie).to_numpy(dtype=str)
+        linhas_por_chave = {}
+        for linha, chave in enumerate(chaves_filiais.tolist()):
+            linhas_por_chave.setdefault(chave, []).append(linha)
+
+        # Retoma os status gravados no diário por uma execução interrompida; filiais que saíram da
+        # planilha desde então são descartadas
+        descartados = 0
+        for chave, coluna, valor in carregar_diario(caminho_excel):
+            if chave not in linhas_por_chave:
+                descartados += 1
+                continue
+            for linha in linhas_por_chave[chave]:
+                df.at[linha, coluna] = valor
+                alteracoes[(linha, coluna)] = valor
+        if descartados:
+            log(f"⚠️ {descartados} status do diário ignorados: filiais que não estão mais na planilha", nivel='warning')
+        diario = abrir_diario(caminho_excel)
+
+        manifesto = carregar_manifesto(pasta_destino)
+
+        # Coleta pastas mês e levanta as pendências antes de abrir qualquer PDF
+        pastas = []
+        for ano_pasta, mes_str_pasta, pasta_mes in coletar_pastas(pasta_pdf_base, anos, meses):
+            inicio = time.perf_counter()
+            arquivos = listar_pdfs(pasta_mes)
+            segundos = time.perf_counter() - inicio
+            somar(metricas, 'varredura', segundos, len(arquivos), mes_str_pasta)
+            registrar_arquivo(metricas, 'varredura', pasta_mes, segundos)
+            registradas = filiais_registradas(manifesto, mes_str_pasta, arquivos)
+            novos = arquivos_novos(manifesto, mes_str_pasta, arquivos) if incremental else None
+            if not novos:
+                novos = None  # Pasta inalterada (filiais já registradas) ou mês a refazer por inteiro
+            # Máscara de pendências do mês: nem "concluído" na planilha, nem registrada no manifesto
+            pendente = np.ones(len(df), dtype=bool)
+            if mes_str_pasta in df.columns:
+                pendente &= (df[mes_str_pasta].astype(str).str.strip().str.lower() != 'concluído').to_numpy()
+            if registradas:
+                pendente &= ~np.isin(chaves_filiais, list(registradas))
+            # Modo incremental: as filiais registradas só recebem as páginas dos PDFs novos
+            anteriores = filiais_do_mes(manifesto, mes_str_pasta) if novos is not None else {}
+            incrementais = np.isin(chaves_filiais, list(anteriores)) if anteriores else np.zeros(len(df), dtype=bool)
+            linhas = np.flatnonzero(pendente | incrementais)
+            pendentes = [(idx, filial, cnpj, anteriores.get(chave))
+                         for idx, filial, cnpj, chave in zip(linhas.tolist(), filiais[linhas].tolist(),
+                                                             cnpjs_limpos_para_buscar[linhas].tolist(),
+                                                             chaves_filiais[linhas].tolist())]
+            # Só filiais já registradas: basta ler os PDFs novos
+            if novos is not None and not (pendente & ~incrementais).any():
+                a_ler = {p: identidade for p, identidade in arquivos.items() if p in novos}
+            else:
+                a_ler = arquivos
+            pastas.append((ano_pasta, mes_str_pasta, arquivos, a_ler, pendentes, novos))
+            resumo['incrementais'] += int(incrementais.sum())
+            resumo['meses'][mes_str_pasta] = {'pdfs': len(a_ler), 'pendentes': len(pendentes),
+                                              'concluidos': 0, 'nao_encontrados': 0, 'erros_gravacao': 0}
+        total_steps = sum(len(pasta[4]) for pasta in pastas)
+        resumo['pendentes'] = total_steps
+        log(f"📋 {total_steps} filial/mês pendentes em {len(pastas)} pastas"
+            + (f" ({resumo['incrementais']} com PDFs novos)" if resumo['incrementais'] else ""),
+            pendentes=total_steps, pastas=len(pastas), incrementais=resumo['incrementais'])
+        notificar('configure', maximum=total_steps)
+
+        def registrar_resultado(mes_str_pasta, resultados_mes, idx, status, saidas, paginas, erros, impressoes):
+            # O status vai para o diário e, ao final, para a planilha (gravar_status_excel)
+            with medir(metricas, 'diario', mes_str_pasta):
+                registrar_status(diario, alteracoes, idx, chaves_filiais[idx], mes_str_pasta, status)
+            resultados_mes[chaves_filiais[idx]] = {'status': status, 'saidas': saidas, 'impressoes': impressoes}
+            chave_resumo = {'Concluído': 'concluidos', STATUS_ERRO_GRAVACAO: 'erros_gravacao'}.get(status, 'nao_encontrados')
+            resumo[chave_resumo] += 1
+            resumo['meses'][mes_str_pasta][chave_resumo] += 1
+            resumo['erros_paginas'] += erros
+
+        def concluir_mes(mes_str_pasta, arquivos, resultados_mes, novos):
+            # Pasta mês concluída: registra no manifesto para ser pulada nas próximas execuções;
+            # filiais com erro de gravação ficam de fora para serem refeitas
+            falhas = [chave for chave, r in resultados_mes.items() if r['status'] == STATUS_ERRO_GRAVACAO]
+            gravadas = {chave: r for chave, r in resultados_mes.items() if r['status'] != STATUS_ERRO_GRAVACAO}
+            with medir(metricas, 'manifesto', mes_str_pasta):
+                registrar_mes(manifesto, mes_str_pasta, arquivos,
+                              {chave: {'status': r['status'], 'saidas': r['saidas']} for chave, r in gravadas.items()},
+                              incremental=novos is not None, descartadas=falhas)
+                salvar_mes(pasta_destino, manifesto, mes_str_pasta,
+                           {saida: valores for r in gravadas.values() for saida, valores in r['impressoes'].items()})
+
+        # Nada pendente: nem os PDFs da pasta são lidos
+        pastas = [pasta for pasta in pastas if pasta[4]]
+
+        paralelo = meses_simultaneos > 1 and len(pastas) > 1
+        if paralelo and not politica.competencia_da_pasta:
+            log("ℹ️ Meses processados em sequência: sem a competência da pasta, meses diferentes podem gravar a mesma saída")
+            paralelo = False
+
+        if paralelo:
+            # Meses independentes em paralelo, cada um num processo que faz a própria extração; os resultados
+            # voltam para este processo, o único que escreve na planilha, no diário e no manifesto.
+            # A pausa só impede o início de novos meses
+            pool_meses = ProcessPoolExecutor(max_workers=meses_simultaneos)
+            fila_pastas = deque(pastas)
+            em_andamento = {}
+            while fila_pastas or em_andamento:
+                while fila_pastas and len(em_andamento) < meses_simultaneos and not (pause_event is not None and pause_event.is_set()):
+                    ano_pasta, mes_str_pasta, arquivos, a_ler, pendentes, novos = fila_pastas.popleft()
+                    log(f"🚀 Processando {mes_str_pasta}", mes=mes_str_pasta)
+                    log(f"Mês {mes_str_pasta}: {len(a_ler)} PDFs encontrados", mes=mes_str_pasta, pdfs=len(a_ler))
+                    futuro = pool_meses.submit(processar_mes_isolado, ano_pasta, mes_str_pasta, list(a_ler),
+                                               pendentes, pasta_destino, politica, caminho_cache, limite_memoria_mb, novos,
+                                               opcoes_pdf)
+                    em_andamento[futuro] = (mes_str_pasta, arquivos, novos)
+                notificar('status', texto=f"🚀 Processando {', '.join(mes for mes, _, _ in em_andamento.values())}")
+                if not em_andamento:
+                    time.sleep(0.1)  # Pausado sem meses em andamento
+                    continue
+                prontos, _ = wait(em_andamento, timeout=0.5, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    mes_str_pasta, arquivos, novos = em_andamento.pop(futuro)
+                    resultados, eventos, metricas_mes = futuro.result()
+                    mesclar_metricas(metricas, metricas_mes)
+                    for evento, dados in eventos:
+                        notificar(evento, **dados)
+                    resultados_mes = {}
+                    for resultado in resultados:
+                        registrar_resultado(mes_str_pasta, resultados_mes, *resultado)
+                    notificar('step', value=len(resultados), start=start_time)
+                    concluir_mes(mes_str_pasta, arquivos, resultados_mes, novos)
+        else:
+            trabalhadores = max_workers or os.cpu_count() or 1
+            pool_extracao = criar_pool_extracao(trabalhadores)
+            # No máximo duas extrações por processo em andamento, limitando a memória a poucos documentos
+            janela_extracao = 2 * trabalhadores
+            cache = abrir_cache(caminho_cache)
+            origem = None
+            # Pré-leitura (só nos meses em sequência): enquanto um mês é processado, os PDFs do próximo
+            # são copiados para o disco local, para a leitura da rede se sobrepor ao processamento
+            if pre_leitura_mb and len(pastas) > 1:
+                pre_leitura = iniciar_pre_leitura(os.path.join(os.path.dirname(caminho_cache), 'pre_leitura'), pre_leitura_mb)
+                origem = lambda p: caminho_local(pre_leitura, p)
+            tabela_cache = 'tokens' if limite_memoria_mb else 'paginas'
+
+            # Itera por mês, indexando as páginas de cada pasta uma única vez
+            for posicao, (ano_pasta, mes_str_pasta, arquivos, a_ler, pendentes, novos) in enumerate(pastas):
+                if pre_leitura is not None and posicao + 1 < len(pastas):
+                    # Próximo mês: copia para o disco local só o que não está no cache
+                    proximos = pastas[posicao + 1][3]
+                    agendar_pre_leitura(pre_leitura, {p: identidade for p, identidade in proximos.items()
+                                                      if not possui_entrada(cache, p, identidade, tabela_cache)})
+                notificar('status', texto=f"🚀 Processando {mes_str_pasta}")
+                log(f"🚀 Processando {mes_str_pasta}", mes=mes_str_pasta)
+                pdfs = list(a_ler)
+                log(f"Mês {mes_str_pasta}: {len(pdfs)} PDFs encontrados", mes=mes_str_pasta, pdfs=len(pdfs))
+
+                resultados_mes = {}
+                with closing(processar_mes(ano_pasta, mes_str_pasta, pdfs, pendentes, pasta_destino, notificar, politica,
+                                           pool_extracao, cache, limite_memoria_mb, pause_event, metricas,
+                                           origem, novos, opcoes_pdf, janela_extracao)) as resultados:
+                    for resultado in resultados:
+                        registrar_resultado(mes_str_pasta, resultados_mes, *resultado)
+                        notificar('step', value=1, start=start_time)
+                if pre_leitura is not None:
+                    liberar_pre_leitura(pre_leitura, pdfs, metricas, mes_str_pasta)
+                concluir_mes(mes_str_pasta, arquivos, resultados_mes, novos)
+
+        # Grava no Excel só as células alteradas (o diário já serviu de checkpoint durante a execução)
+        diario.close()
+        notificar('status', texto="💾 Gravando status no Excel...")
+        with medir(metricas, 'excel'):
+            gravar_status_excel(caminho_excel, alteracoes, [pasta[1] for pasta in pastas])
+
+        etapas = sorted(metricas['etapas'].items(), key=lambda item: item[1]['segundos'], reverse=True)
+        log("⏱️ " + " | ".join(f"{etapa} {total['segundos']:.1f}s" for etapa, total in etapas[:6]))
+        notificar('status', texto="🎉 Processo finalizado!")
+        log("🎉 Processo finalizado!")
+    except Exception:
+        if alteracoes:
+            log(f"📝 Status preservados em {caminho_diario(caminho_excel)}; serão aplicados na próxima execução.", nivel='warning')
+        raise
+    finally:
+        if diario is not None:
+            diario.close()
+        if pool_extracao is not None:
+            pool_extracao.shutdown()
+        if pool_meses is not None:
+            pool_meses.shutdown(cancel_futures=True)
+        if pre_leitura is not None:
+            encerrar_pre_leitura(pre_leitura)
+        if cache is not None:
+            cache.close()
+        resumo['duracao_s'] = round(time.time() - start_time, 3)
+        resumo['metricas'] = resumir_metricas(metricas)
+        if perfil is not None:
+            perfil.disable()
+            perfil.dump_stats(caminho_perfil)
+        if os.path.isdir(pasta_destino):
+            salvar_metricas(metricas, caminho_metricas or os.path.join(pasta_destino, '.sefip_metricas.json'))
+
+    return resumo
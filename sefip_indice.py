@@ -0,0 +1,212 @@
+import os
+import sqlite3
+import tempfile
+import zlib
+from array import array
+from collections import namedtuple
+import fitz  # PyMuPDF for handling PDF files
+from cache_paginas import ler_tokens, gravar_tokens
+from extracao_pdfs import iterar_extracoes
+from sefip_tokens import tokenizar_pagina, impressao_pagina
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Tokens de um PDF em arrays compactos, sem o texto das páginas:
+#   comps: competência de cada página como ano * 100 + mês (0 = sem competência)
+#   impressoes: impressão digital de cada página (sefip_tokens.impressao_pagina)
+#   cnpjs/paginas_cnpj e raizes/paginas_raiz: pares (CNPJ ou raiz como int, página)
+TokensPdf = namedtuple('TokensPdf', 'comps impressoes cnpjs paginas_cnpj raizes paginas_raiz')
+TIPOS_TOKENS = ('I', 'Q', 'Q', 'I', 'I', 'I')
+
+# Sem psutil, o tamanho do índice em memória é estimado por ocorrência (chave + array + folga do dict)
+BYTES_POR_OCORRENCIA = 48
+
+# Tipos de ocorrência gravados no arquivo de transbordo
+TIPO_CNPJ = 0
+TIPO_RAIZ = 1
+
+
+def tokenizar_pdf(p):
+    """
+    Lê um PDF página a página e guarda só os tokens (competência, CNPJs, raízes e impressão digital);
+    o texto de cada página é descartado logo em seguida. Roda dentro dos processos do pool.
+    Retorna TokensPdf, ou None se o PDF não pôde ser lido (para não ir ao cache).
+    """
+    tokens = TokensPdf(*(array(tipo) for tipo in TIPOS_TOKENS))
+    try:
+        with fitz.open(p) as doc:
+            for i, page in enumerate(doc):
+                texto = page.get_text() or ""
+                registro = tokenizar_pagina(texto)
+                comp = int(registro.ano) * 100 + int(registro.mes) if registro.mes else 0
+                tokens.comps.append(comp)
+                tokens.impressoes.append(impressao_pagina(texto))
+                for cnpj in registro.cnpjs:
+                    tokens.cnpjs.append(int(cnpj))
+                    tokens.paginas_cnpj.append(i)
+                for raiz in registro.raizes:
+                    tokens.raizes.append(int(raiz))
+                    tokens.paginas_raiz.append(i)
+    except Exception:
+        return None
+    return tokens
+
+
+def serializar_tokens(tokens):
+    """
+    Converte TokensPdf em bytes (tamanhos dos arrays + conteúdo), comprimidos com zlib.
+    """
+    tamanhos = array('Q', (len(a) for a in tokens))
+    return zlib.compress(tamanhos.tobytes() + b''.join(a.tobytes() for a in tokens))
+
+
+def desserializar_tokens(dados):
+    """
+    Inverso de serializar_tokens.
+    """
+    dados = zlib.decompress(dados)
+    tamanhos = array('Q', dados[:8 * len(TIPOS_TOKENS)])
+    pos = 8 * len(TIPOS_TOKENS)
+    arrays = []
+    for tipo, tamanho in zip(TIPOS_TOKENS, tamanhos):
+        a = array(tipo)
+        fim = pos + tamanho * a.itemsize
+        a.frombytes(dados[pos:fim])
+        arrays.append(a)
+        pos = fim
+    return TokensPdf(*arrays)
+
+
+def iterar_tokens_pdfs(pdfs, executor=None, cache=None, metricas=None, mes=None, origem=None, janela=1):
+    """
+    Como sefip_engine.iterar_textos_pdfs, mas gera (pdf_path, TokensPdf) sem nunca trazer o texto das
+    páginas para o processo principal. Os tokens ficam na tabela própria do cache de páginas.
+    """
+    def ler(p, identidade):
+        dados = ler_tokens(cache, p, identidade)
+        return desserializar_tokens(dados) if dados is not None else None
+
+    def gravar(p, identidade, tokens):
+        gravar_tokens(cache, p, identidade, serializar_tokens(tokens))
+        cache.commit()
+
+    if cache is None:
+        ler = gravar = None
+    for p, tokens in iterar_extracoes(pdfs, tokenizar_pdf, ler, gravar, executor, janela, metricas, mes, origem):
+        yield p, tokens if tokens is not None else TokensPdf(*(array(tipo) for tipo in TIPOS_TOKENS))
+
+
+def memoria_processo():
+    """
+    RSS do processo atual em bytes, ou None se psutil não estiver disponível.
+    """
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+def indexar_tokens(documentos, mes_str, politica, limite_memoria_mb=None):
+    """
+    Versão compacta de sefip_engine.indexar_paginas para o modo de memória limitada, sobre (pdf, TokensPdf).
+    Liberar com fechar_indice.
+    """
+    indice = {'cnpj': {}, 'raiz': {}, 'impressoes': [], 'comps': [], 'pdfs': [], 'disco': None, 'caminho_disco': None}
+    limite = limite_memoria_mb * 1024 * 1024 if limite_memoria_mb else None
+    comp_pasta = int(mes_str[3:]) * 100 + int(mes_str[:2])
+    ocorrencias = 0
+    try:
+        for ordem, (p, tokens) in enumerate(documentos):
+            indice['pdfs'].append(p)
+            # 8 bytes por página; o texto em si nunca chega aqui
+            indice['impressoes'].append(tokens.impressoes)
+            indice['comps'].append(tokens.comps)
+            # Cada ocorrência é um int (posição do PDF << 32 | página) em arrays por CNPJ/raiz
+            base = ordem << 32
+            tipos = [('cnpj', tokens.cnpjs, tokens.paginas_cnpj)]
+            if politica.raiz:
+                tipos.append(('raiz', tokens.raizes, tokens.paginas_raiz))
+            for tipo, chaves, paginas in tipos:
+                destino = indice[tipo]
+                for chave, i in zip(chaves, paginas):
+                    comp = tokens.comps[i]
+                    if comp == 0 or (politica.competencia_da_pasta and comp != comp_pasta):
+                        continue
+                    hits = destino.get(chave)
+                    if hits is None:
+                        hits = destino[chave] = array('Q')
+                    hits.append(base | i)
+                    ocorrencias += 1
+
+            # Acima de limite_memoria_mb (RSS, ou sem psutil o tamanho estimado): transborda para o disco
+            if limite is not None and ocorrencias:
+                rss = memoria_processo()
+                usado = rss if rss is not None else ocorrencias * BYTES_POR_OCORRENCIA
+                if usado > limite:
+                    transbordar_indice(indice)
+                    ocorrencias = 0
+
+        if indice['disco'] is not None:
+            # Restante vai para o disco também, para as consultas virem de um só lugar ordenado
+            transbordar_indice(indice)
+            indice['disco'].execute("CREATE INDEX IF NOT EXISTS idx_chave ON ocorrencias (tipo, chave)")
+    except BaseException:
+        fechar_indice(indice)
+        raise
+    return indice
+
+
+def transbordar_indice(indice):
+    """
+    Move as ocorrências em memória do índice para o SQLite temporário (criado na primeira vez).
+    """
+    if indice['disco'] is None:
+        fd, caminho = tempfile.mkstemp(prefix='sefip_indice_', suffix='.sqlite3')
+        os.close(fd)
+        indice['caminho_disco'] = caminho
+        indice['disco'] = sqlite3.connect(caminho)
+        indice['disco'].execute("PRAGMA journal_mode=OFF")
+        indice['disco'].execute("PRAGMA synchronous=OFF")
+        indice['disco'].execute("CREATE TABLE ocorrencias (tipo INTEGER, chave INTEGER, hit INTEGER)")
+    con = indice['disco']
+    for tipo, nome in ((TIPO_CNPJ, 'cnpj'), (TIPO_RAIZ, 'raiz')):
+        con.executemany(
+            "INSERT INTO ocorrencias (tipo, chave, hit) VALUES (?, ?, ?)",
+            ((tipo, chave, hit) for chave, hits in indice[nome].items() for hit in hits),
+        )
+        indice[nome] = {}
+    con.commit()
+
+
+def buscar_paginas_tokens(indice, cnpj_limpo):
+    """
+    Como sefip_engine.buscar_paginas: retorna [(pdf, página, impressão, (ano, mes))] do CNPJ completo
+    ou da raiz, na ordem dos PDFs, consultando a memória e o transbordo em disco.
+    """
+    cnpj, raiz = int(cnpj_limpo), int(cnpj_limpo[:8])
+    hits = set(indice['cnpj'].get(cnpj, ()))
+    hits.update(indice['raiz'].get(raiz, ()))
+    if indice['disco'] is not None:
+        hits.update(hit for (hit,) in indice['disco'].execute(
+            "SELECT hit FROM ocorrencias WHERE (tipo = ? AND chave = ?) OR (tipo = ? AND chave = ?)",
+            (TIPO_CNPJ, cnpj, TIPO_RAIZ, raiz)))
+    encontradas = []
+    for hit in sorted(hits):
+        ordem, i = hit >> 32, hit & 0xFFFFFFFF
+        comp = indice['comps'][ordem][i]
+        encontradas.append((indice['pdfs'][ordem], i, indice['impressoes'][ordem][i], (str(comp // 100), f"{comp % 100:02d}")))
+    return encontradas
+
+
+def fechar_indice(indice):
+    """
+    Fecha e remove o transbordo em disco do índice, se houver.
+    """
+    if indice['disco'] is not None:
+        indice['disco'].close()
+        indice['disco'] = None
+    if indice['caminho_disco'] and os.path.exists(indice['caminho_disco']):
+        os.remove(indice['caminho_disco'])
+        indice['caminho_disco'] = None
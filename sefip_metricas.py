@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import heapq
+from contextlib import contextmanager
+
+# Quantos arquivos mais lentos guardar por etapa
+LIMITE_ARQUIVOS_LENTOS = 20
+
+
+def criar_metricas():
+    """
+    Cria o acumulador de métricas da execução:
+    {'etapas': {etapa: {'segundos', 'quantidade'}}, 'meses': {mes: {etapa: {...}}},
+     'arquivos_lentos': {etapa: [(segundos, caminho), ...]}}
+    Todas as funções abaixo aceitam metricas=None e não fazem nada nesse caso.
+    """
+    return {'etapas': {}, 'meses': {}, 'arquivos_lentos': {}}
+
+
+def somar(metricas, etapa, segundos, quantidade=1, mes=None):
+    """
+    Acumula tempo e quantidade na etapa, no total e (se informado) no mês.
+    """
+    if metricas is None:
+        return
+    destinos = [metricas['etapas']]
+    if mes is not None:
+        destinos.append(metricas['meses'].setdefault(mes, {}))
+    for destino in destinos:
+        total = destino.setdefault(etapa, {'segundos': 0.0, 'quantidade': 0})
+        total['segundos'] += segundos
+        total['quantidade'] += quantidade
+
+
+@contextmanager
+def medir(metricas, etapa, mes=None, quantidade=1):
+    """
+    Cronometra o bloco with e soma na etapa (ver somar).
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        somar(metricas, etapa, time.perf_counter() - inicio, quantidade, mes)
+
+
+def registrar_arquivo(metricas, etapa, caminho, segundos):
+    """
+    Guarda o arquivo entre os LIMITE_ARQUIVOS_LENTOS mais lentos da etapa.
+    """
+    if metricas is None:
+        return
+    lentos = metricas['arquivos_lentos'].setdefault(etapa, [])
+    if len(lentos) < LIMITE_ARQUIVOS_LENTOS:
+        heapq.heappush(lentos, (segundos, caminho))
+    elif segundos > lentos[0][0]:
+        heapq.heapreplace(lentos, (segundos, caminho))
+
+
+def cronometrar_iteravel(iteravel, metricas, etapa, mes=None):
+    """
+    Repassa os itens do iterável somando na etapa o tempo gasto para produzir cada um.
+    """
+    iterador = iter(iteravel)
+    while True:
+        inicio = time.perf_counter()
+        try:
+            item = next(iterador)
+        except StopIteration:
+            return
+        somar(metricas, etapa, time.perf_counter() - inicio, 1, mes)
+        yield item
+
+
+def executar_cronometrado(funcao, *args):
+    """
+    Executa funcao(*args) e retorna (resultado, segundos). Usado dentro dos processos do pool,
+    para que o tempo medido seja o do trabalho e não o da fila.
+    """
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def mesclar_metricas(metricas, outras):
+    """
+    Soma as métricas de outro processo (ver sefip_engine.processar_mes_isolado) nas da execução.
+    """
+    if metricas is None or outras is None:
+        return
+    for etapa, total in outras['etapas'].items():
+        somar(metricas, etapa, total['segundos'], total['quantidade'])
+    for mes, etapas in outras['meses'].items():
+        for etapa, total in etapas.items():
+            destino = metricas['meses'].setdefault(mes, {}).setdefault(etapa, {'segundos': 0.0, 'quantidade': 0})
+            destino['segundos'] += total['segundos']
+            destino['quantidade'] += total['quantidade']
+    for etapa, lentos in outras['arquivos_lentos'].items():
+        for segundos, caminho in lentos:
+            registrar_arquivo(metricas, etapa, caminho, segundos)
+
+
+def resumir_metricas(metricas):
+    """
+    Versão serializável das métricas: tempos arredondados e arquivos lentos do mais lento ao mais rápido.
+    """
+    def arredondar(etapas):
+        return {etapa: {'segundos': round(total['segundos'], 4), 'quantidade': total['quantidade']}
+                for etapa, total in etapas.items()}
+
+    return {
+        'etapas': arredondar(metricas['etapas']),
+        'meses': {mes: arredondar(etapas) for mes, etapas in metricas['meses'].items()},
+        'arquivos_lentos': {etapa: [{'arquivo': caminho, 'segundos': round(segundos, 4)}
+                                    for segundos, caminho in sorted(lentos, reverse=True)]
+                            for etapa, lentos in metricas['arquivos_lentos'].items()},
+    }
+
+
+def salvar_metricas(metricas, caminho):
+    """
+    Grava resumir_metricas em JSON de forma atômica (arquivo temporário + os.replace).
+    """
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(resumir_metricas(metricas), f, ensure_ascii=False, indent=2)
+    os.replace(caminho + '.tmp', caminho)
@@ -0,0 +1,123 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from sefip_metricas import somar
+
+# Cópias simultâneas do drive de rede para o disco local
+THREADS_PRE_LEITURA = 2
+
+
+def copiar_arquivo(origem, destino):
+    """
+    Copia um PDF para a pasta local. Roda nas threads da pré-leitura; retorna os segundos gastos.
+    """
+    inicio = time.perf_counter()
+    shutil.copyfile(origem, destino)
+    return time.perf_counter() - inicio
+
+
+def iniciar_pre_leitura(pasta_base, limite_mb, threads=THREADS_PRE_LEITURA):
+    """
+    Cria a pré-leitura: threads que copiam os PDFs das próximas pastas mês do drive de rede para
+    uma pasta temporária local enquanto o mês atual é processado. No máximo limite_mb ficam no disco
+    local ao mesmo tempo (copiados ou em cópia); o restante espera vaga na fila.
+    Retorna o estado usado pelas demais funções; encerrar com encerrar_pre_leitura.
+    """
+    os.makedirs(pasta_base, exist_ok=True)
+    return {
+        'pasta': tempfile.mkdtemp(prefix='sefip_', dir=pasta_base),
+        'limite': limite_mb * 1024 * 1024,
+        'usado': 0,
+        'fila': deque(),
+        'copias': {},
+        'contador': 0,
+        'lock': threading.Lock(),
+        'executor': ThreadPoolExecutor(max_workers=threads),
+    }
+
+
+def _bombear(estado):
+    """
+    Inicia as cópias da fila enquanto houver espaço no limite. Chamar com estado['lock'].
+    """
+    while estado['fila']:
+        p, tamanho = estado['fila'][0]
+        if estado['usado'] + tamanho > estado['limite'] and estado['usado'] > 0:
+            break
+        estado['fila'].popleft()
+        if tamanho > estado['limite']:
+            continue  # Maior que o limite inteiro: será lido direto da rede
+        estado['contador'] += 1
+        local = os.path.join(estado['pasta'], f"{estado['contador']:06d}_{os.path.basename(p)}")
+        estado['usado'] += tamanho
+        estado['copias'][p] = (local, tamanho, estado['executor'].submit(copiar_arquivo, p, local))
+
+
+def agendar_pre_leitura(estado, arquivos):
+    """
+    Coloca na fila os PDFs {pdf_path: (tamanho, mtime_ns)}, na ordem em que serão lidos.
+    """
+    with estado['lock']:
+        for p, (tamanho, _) in arquivos.items():
+            if p not in estado['copias']:
+                estado['fila'].append((p, tamanho))
+        _bombear(estado)
+
+
+def caminho_local(estado, p):
+    """
+    Caminho de onde ler o PDF: a cópia local, se ela foi agendada (espera a cópia terminar),
+    ou o próprio caminho de rede, se não foi ou se a cópia falhou.
+    """
+    with estado['lock']:
+        copia = estado['copias'].get(p)
+    if copia is None:
+        return p
+    local, _, futuro = copia
+    try:
+        futuro.result()
+    except (OSError, CancelledError):
+        return p
+    return local
+
+
+def liberar_pre_leitura(estado, pdfs, metricas=None, mes=None):
+    """
+    Apaga as cópias locais dos PDFs já processados, abrindo espaço para a fila, e soma o tempo
+    das cópias em metricas ('pre_leitura').
+    """
+    liberados = []
+    with estado['lock']:
+        removidos = set()
+        for p in pdfs:
+            copia = estado['copias'].pop(p, None)
+            if copia is not None:
+                liberados.append(copia)
+                estado['usado'] -= copia[1]
+            removidos.add(p)
+        # PDFs ainda na fila não precisam mais ser copiados
+        estado['fila'] = deque(item for item in estado['fila'] if item[0] not in removidos)
+    for local, tamanho, futuro in liberados:
+        if not futuro.cancel():
+            try:
+                somar(metricas, 'pre_leitura', futuro.result(), 1, mes)
+            except (OSError, CancelledError):
+                pass
+        if os.path.exists(local):
+            os.remove(local)
+    with estado['lock']:
+        _bombear(estado)
+
+
+def encerrar_pre_leitura(estado):
+    """
+    Cancela as cópias pendentes, encerra as threads e apaga a pasta temporária.
+    """
+    with estado['lock']:
+        estado['fila'].clear()
+    estado['executor'].shutdown(wait=True, cancel_futures=True)
+    shutil.rmtree(estado['pasta'], ignore_errors=True)
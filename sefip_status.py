@@ -0,0 +1,265 @@
+import os
+import json
+from openpyxl import load_workbook
+from openpyxl.styles import Font, Alignment, PatternFill
+
+
+def caminho_diario(caminho_excel):
+    """
+    Caminho do diário de status ao lado da planilha (uma linha JSON por célula alterada).
+    """
+    return caminho_excel + '.status.jsonl'
+
+
+def carregar_diario(caminho_excel):
+    """
+    Lê o diário deixado por uma execução interrompida.
+    Retorna lista de tuplas (chave_filial, coluna, valor); uma última linha incompleta e registros
+    sem chave (gravados pela posição da linha, que não sobrevive a uma planilha editada) são ignorados.
+    """
+    alteracoes = []
+    caminho = caminho_diario(caminho_excel)
+    if not os.path.exists(caminho):
+        return alteracoes
+    with open(caminho, encoding='utf-8') as f:
+        for linha in f:
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                continue
+            if 'chave' in registro:
+                alteracoes.append((registro['chave'], registro['coluna'], registro['valor']))
+    return alteracoes
+
+
+def abrir_diario(caminho_excel):
+    """
+    Abre o diário de status para acrescentar registros.
+    """
+    caminho = caminho_diario(caminho_excel)
+    diario = open(caminho, 'a', encoding='utf-8')
+    if diario.tell() > 0:
+        # Uma queda no meio da escrita deixa a última linha sem '\n'; não emenda o próximo registro nela
+        with open(caminho, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                diario.write('\n')
+    return diario
+
+
+def registrar_status(diario, alteracoes, linha, chave, coluna, valor):
+    """
+    Checkpoint barato de uma célula: acrescenta uma linha ao diário e guarda a alteração
+    em memória para ser aplicada na planilha ao final. O diário guarda a chave da filial
+    (Filial|cnpj, como no manifesto), não a linha, para sobreviver a uma planilha editada.
+    """
+    linha = int(linha)
+    diario.write(json.dumps({'chave': chave, 'coluna': coluna, 'valor': valor}, ensure_ascii=False) + '\n')
+    diario.flush()
+    alteracoes[(linha, coluna)] = valor
+
+
+def gravar_status_excel(caminho_excel, alteracoes, ordem_colunas=None):
+    """
+    Aplica as alterações {(linha_df, coluna): valor} na planilha com openpyxl, escrevendo só as
+    células alteradas e criando as colunas de mês que ainda não existem (na ordem de ordem_colunas,
+    se informada; senão, na ordem das alterações). Mantém a formatação e (re)aplica o estilo do
+    cabeçalho. Após gravar, o diário é removido.
+    """
+    wb = load_workbook(caminho_excel)
+    try:
+        ws = wb.active
+        colunas = {cell.value: cell.column for cell in ws[1] if cell.value is not None}
+        novas = {coluna for _, coluna in alteracoes}
+        for coluna in ordem_colunas or ():
+            if coluna in novas and coluna not in colunas:
+                colunas[coluna] = ws.max_column + 1
+                ws.cell(row=1, column=colunas[coluna], value=coluna)
+        for (linha, coluna), valor in alteracoes.items():
+            if coluna not in colunas:
+                colunas[coluna] = ws.max_column + 1
+                ws.cell(row=1, column=colunas[coluna], value=coluna)
+            # Linha 1 é o cabeçalho; o índice do DataFrame começa em 0
+            ws.cell(row=linha + 2, column=colunas[coluna], value=valor)
+
+        header_font = Font(bold=True, color="FFFFFF")
+        header_align = Alignment(horizontal='center')
+        header_fill = PatternFill(start_color="1E3A8A", end_color="1E3A8A", fill_type="solid")
+        for cell in ws[1]:
+            cell.font = header_font
+            cell.alignment = header_align
+            cell.fill = header_fill
+        wb.save(caminho_excel)
+    finally:
+        wb.close()
+
+    if os.path.exists(caminho_diario(caminho_excel)):
+        os.remove(caminho_diario(caminho_excel))
+
+
+def caminho_manifesto(pasta_destino):
+    """
+    Pasta do manifesto da execução, guardada junto das saídas: um arquivo JSON por pasta mês.
+    """
+    return os.path.join(pasta_destino, '.sefip_manifesto')
+
+
+def caminho_registro_mes(pasta_destino, mes_str):
+    """
+    Arquivo do manifesto com o registro de uma pasta mês.
+    """
+    return os.path.join(caminho_manifesto(pasta_destino), mes_str + '.json')
+
+
+def carregar_manifesto(pasta_destino):
+    """
+    Lê o manifesto com as pastas mês já concluídas e as saídas de cada filial.
+    Formato: {'meses': {mes_str: {'arquivos': {nome_pdf: [tamanho, mtime_ns]},
+                                  'filiais': {chave_filial: {'status': ..., 'saidas': [caminho, ...]}}}}}
+    Os caminhos das saídas são relativos a pasta_destino; as impressões digitais ficam à parte (carregar_impressoes).
+    """
+    manifesto = {'meses': {}}
+    migrar_manifesto_antigo(pasta_destino, manifesto)
+    try:
+        nomes = os.listdir(caminho_manifesto(pasta_destino))
+    except OSError:
+        nomes = []
+    for nome in nomes:
+        mes_str, extensao = os.path.splitext(nome)
+        if extensao != '.json':
+            continue
+        try:
+            with open(os.path.join(caminho_manifesto(pasta_destino), nome), encoding='utf-8') as f:
+                manifesto['meses'][mes_str] = json.load(f)
+        except (OSError, ValueError):
+            continue
+    return manifesto
+
+
+def migrar_manifesto_antigo(pasta_destino, manifesto):
+    """
+    Converte o manifesto de arquivo único (.sefip_manifesto.json, com caminhos absolutos) para
+    um arquivo por mês e o remove. As saídas antigas foram gravadas como os.path.join(pasta_destino, ...).
+    """
+    caminho = os.path.join(pasta_destino, '.sefip_manifesto.json')
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            antigo = json.load(f)
+    except (OSError, ValueError):
+        return
+
+    def relativo(saida):
+        return os.path.relpath(saida, pasta_destino)
+
+    for mes_str, registro in antigo.get('meses', {}).items():
+        impressoes = {}
+        for filial in registro.get('filiais', {}).values():
+            filial['saidas'] = [relativo(saida) for saida in filial.get('saidas', [])]
+            impressoes.update((relativo(saida), valores) for saida, valores in filial.pop('impressoes', {}).items())
+        manifesto['meses'][mes_str] = registro
+        salvar_mes(pasta_destino, manifesto, mes_str, impressoes)
+    os.remove(caminho)
+
+
+def salvar_mes(pasta_destino, manifesto, mes_str, impressoes=None):
+    """
+    Grava só o registro da pasta mês, de forma atômica (arquivo temporário + os.replace).
+    impressoes ({saida: [impressão, ...]}) atualiza o arquivo de impressões do mês, que guarda só as
+    das saídas ainda registradas.
+    """
+    os.makedirs(caminho_manifesto(pasta_destino), exist_ok=True)
+    registro = manifesto['meses'][mes_str]
+    caminho = caminho_registro_mes(pasta_destino, mes_str)
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(registro, f, ensure_ascii=False)
+    os.replace(caminho + '.tmp', caminho)
+    if impressoes is None:
+        return
+    registradas = {saida for filial in registro['filiais'].values() for saida in filial['saidas']}
+    todas = carregar_impressoes(pasta_destino, mes_str)
+    todas.update(impressoes)
+    caminho = caminho_impressoes_mes(pasta_destino, mes_str)
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({saida: valores for saida, valores in todas.items() if saida in registradas}, f)
+    os.replace(caminho + '.tmp', caminho)
+
+
+def caminho_impressoes_mes(pasta_destino, mes_str):
+    """
+    Arquivo, ao lado do registro do mês, com as impressões digitais das páginas de cada saída.
+    """
+    return os.path.join(caminho_manifesto(pasta_destino), mes_str + '.impressoes')
+
+
+def carregar_impressoes(pasta_destino, mes_str):
+    """
+    Impressões digitais das páginas já gravadas em cada saída do mês: {saida: [impressão, ...]}.
+    Só o modo incremental precisa delas, por isso não vêm com carregar_manifesto.
+    """
+    try:
+        with open(caminho_impressoes_mes(pasta_destino, mes_str), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def filiais_registradas(manifesto, mes_str, arquivos):
+    """
+    Retorna as chaves de filial já processadas na pasta mês, desde que a pasta não tenha mudado
+    (mesmos PDFs, tamanhos e mtimes). Se mudou, nenhuma filial conta como registrada.
+    arquivos: {pdf_path: (tamanho, mtime_ns)}
+    """
+    registro = manifesto['meses'].get(mes_str)
+    if not registro or registro.get('arquivos') != resumo_arquivos(arquivos):
+        return set()
+    return set(registro.get('filiais', {}))
+
+
+def arquivos_novos(manifesto, mes_str, arquivos):
+    """
+    Para o modo incremental: retorna o conjunto de PDFs novos ou alterados da pasta mês desde o
+    registro no manifesto (vazio se nada mudou), ou None se não houver registro ou se algum PDF
+    registrado tiver sido removido (nesse caso o mês precisa ser refeito por inteiro).
+    arquivos: {pdf_path: (tamanho, mtime_ns)}
+    """
+    registro = manifesto['meses'].get(mes_str)
+    if not registro:
+        return None
+    anteriores = registro.get('arquivos', {})
+    atuais = resumo_arquivos(arquivos)
+    if set(anteriores) - set(atuais):
+        return None
+    return {p for p in arquivos if anteriores.get(os.path.basename(p)) != atuais[os.path.basename(p)]}
+
+
+def filiais_do_mes(manifesto, mes_str):
+    """
+    Resultados registrados de cada filial na pasta mês: {chave_filial: {'status', 'saidas'}}.
+    """
+    return manifesto['meses'].get(mes_str, {}).get('filiais', {})
+
+
+def registrar_mes(manifesto, mes_str, arquivos, filiais, incremental=False, descartadas=()):
+    """
+    Registra a pasta mês como concluída: a identidade dos PDFs e o resultado de cada filial
+    processada ({chave_filial: {'status': ..., 'saidas': [...]}}),
+    preservando as já registradas. Se os PDFs mudaram, as filiais registradas antes são descartadas,
+    exceto com incremental (as saídas antigas continuam valendo e só receberam páginas novas).
+    As filiais de descartadas (ex.: saída que não pôde ser gravada) saem do registro para serem refeitas.
+    """
+    registro = manifesto['meses'].get(mes_str)
+    if not registro:
+        registro = {'arquivos': resumo_arquivos(arquivos), 'filiais': {}}
+    elif registro.get('arquivos') != resumo_arquivos(arquivos):
+        registro = {'arquivos': resumo_arquivos(arquivos), 'filiais': registro.get('filiais', {}) if incremental else {}}
+    registro['filiais'].update(filiais)
+    for chave in descartadas:
+        registro['filiais'].pop(chave, None)
+    manifesto['meses'][mes_str] = registro
+
+
+def resumo_arquivos(arquivos):
+    """
+    Converte {pdf_path: (tamanho, mtime_ns)} para o formato gravado no manifesto.
+    """
+    return {os.path.basename(p): list(identidade) for p, identidade in arquivos.items()}
@@ -0,0 +1,100 @@
+import re
+from collections import namedtuple
+from hashlib import blake2b
+
+# Competência nos formatos "COMP: MM/AAAA" e "Comp. Apuração MM/AAAA" (prefixos literais, busca rápida)
+PADRAO_COMP = re.compile(r'COMP\s*[:\.\-]?\s*(\d{2})/(\d{4})')
+PADRAO_APURACAO = re.compile(r'Comp\.\s*Apuração\s*(\d{2})/(\d{4})')
+
+# CNPJ com ou sem máscara (XX.XXX.XXX/XXXX-XX); o sufixo é opcional para capturar a raiz
+PADRAO_CNPJ = re.compile(r'(?<!\d)(\d{2}\.?\d{3}\.?\d{3})(?:/?(\d{4})-?(\d{2}))?(?!\d)')
+
+# Bytes ASCII que não são dígitos, removidos com bytes.translate
+_NAO_DIGITOS = bytes(b for b in range(128) if not 48 <= b <= 57)
+
+# Registro compacto de uma página: competência e CNPJs/raízes encontrados
+RegistroPagina = namedtuple('RegistroPagina', 'mes ano cnpjs raizes')
+
+
+def limpar_cnpj(cnpj):
+    """
+    Remove todos os caracteres não numéricos de um CNPJ.
+    """
+    return str(cnpj).encode('ascii', 'ignore').translate(None, _NAO_DIGITOS).decode('ascii')
+
+
+def impressao_pagina(texto):
+    """
+    Impressão digital estável do conteúdo da página: blake2b de 8 bytes do texto com os espaços
+    normalizados, como int. Ao contrário de hash(), não muda entre processos nem entre execuções.
+    """
+    normalizado = ' '.join(texto.split()).encode('utf-8')
+    return int.from_bytes(blake2b(normalizado, digest_size=8).digest(), 'little')
+
+
+def extrair_comp(texto):
+    """
+    Extrai mês e ano de competência a partir do texto, suportando ambos os formatos.
+    """
+    match = PADRAO_COMP.search(texto) or PADRAO_APURACAO.search(texto)
+    return (match.group(1), match.group(2)) if match else (None, None)
+
+
+def tokenizar_pagina(texto):
+    """
+    Lê a página uma única vez e devolve um RegistroPagina com a competência (ver extrair_comp)
+    e os CNPJs de 14 dígitos e raízes de 8 dígitos, sem repetições e na ordem em que aparecem.
+    """
+    mes, ano = extrair_comp(texto)
+    cnpjs = []
+    raizes = []
+    for bruto, filial, dv in PADRAO_CNPJ.findall(texto):
+        raiz = bruto.replace('.', '')
+        if filial:
+            cnpj = raiz + filial + dv
+            if cnpj not in cnpjs:
+                cnpjs.append(cnpj)
+        elif '.' not in bruto:
+            # 8 dígitos soltos sem máscara não identificam uma raiz de CNPJ
+            continue
+        if raiz not in raizes:
+            raizes.append(raiz)
+    return RegistroPagina(mes, ano, tuple(cnpjs), tuple(raizes))
+
+
+if __name__ == '__main__':
+    # Micro-benchmark: caminho antigo (limpar a página e buscar, para cada filial) x tokenização única da página
+    import random
+    import timeit
+
+    random.seed(0)
+    linhas = [f"Comp. Apuração 03/2023 - SEFIP {random.randint(0, 10**6)}"]
+    for _ in range(60):
+        cnpj = f"{random.randint(10**13, 10**14 - 1)}"
+        linhas.append(f"Empresa: {cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]} "
+                      f"PIS {random.randint(10**10, 10**11)} Valor {random.random() * 1000:.2f}")
+    pagina = "\n".join(linhas)
+    alvo = limpar_cnpj(linhas[30].split()[1])
+    filiais = 2000
+
+    def antigo():
+        mes, ano = (re.search(r'COMP\s*[:\.\-]?\s*(\d{2})/(\d{4})', pagina)
+                    or re.search(r'Comp\.\s*Apuração\s*(\d{2})/(\d{4})', pagina)).groups()
+        return mes == '03' and re.search(re.escape(alvo), re.sub(r'\D', '', pagina))
+
+    def novo():
+        registro = tokenizar_pagina(pagina)
+        return registro.mes == '03' and alvo in registro.cnpjs
+
+    assert antigo() and novo()
+    n = 500
+    t_antigo = timeit.timeit(antigo, number=n) / n
+    t_novo = timeit.timeit(novo, number=n) / n
+    t_limpar_re = timeit.timeit(lambda: re.sub(r'\D', '', '12.345.678/0001-90'), number=100 * n) / (100 * n)
+    t_limpar = timeit.timeit(lambda: limpar_cnpj('12.345.678/0001-90'), number=100 * n) / (100 * n)
+    print(f"Página de {len(pagina)} caracteres:")
+    print(f"  antigo, por filial:         {t_antigo * 1e6:10.1f} µs  ({filiais} filiais: {t_antigo * filiais * 1e3:.0f} ms)")
+    print(f"  tokenizar_pagina, uma vez:  {t_novo * 1e6:10.1f} µs")
+    print("limpar_cnpj de um CNPJ mascarado:")
+    print(f"  re.sub(r'\\D', ''):         {t_limpar_re * 1e9:10.0f} ns")
+    print(f"  bytes.translate:            {t_limpar * 1e9:10.0f} ns")
@@ -7,6 +7,7 @@ import threading
 import concurrent.futures  # Para ProcessPoolExecutor
 import ttkbootstrap as ttk  # Biblioteca para tema moderno
 import re  # Para validação do termo de busca
+from busca_pdf import abrir_indice, textos_pdf, CAMINHO_INDICE_PADRAO
 
 # === TEMAS DISPONÍVEIS ===
 temas_disponiveis = {
@@ -51,26 +52,34 @@ def validar_termo_busca(termo):
     """Verifica se o termo de busca está no formato correto (ex: 1823-35)."""
     return bool(re.fullmatch(r"\d{1,6}-\d{1,6}", termo))
 
+# Conexão com o índice de páginas de cada processo do pool, aberta uma vez em iniciar_processo
+indice = None
+
+def iniciar_processo(caminho_indice=CAMINHO_INDICE_PADRAO):
+    """Abre o índice de páginas local uma vez por processo do pool (textos_pdf grava a cada PDF)."""
+    global indice
+    indice = abrir_indice(caminho_indice)
+
 def processar_pdf(pdf_path, termo_busca, pasta_saida):
-    """Processa um único PDF e filtra páginas que contêm o termo de busca."""
+    """Processa um único PDF e filtra páginas que contêm o termo de busca (texto do índice local, se o PDF não mudou)."""
     try:
+        textos = textos_pdf(pdf_path, indice)
+        paginas_filtradas = [num_pagina + 1 for num_pagina, texto in enumerate(textos) if termo_busca in texto]
+        if not paginas_filtradas:
+            return
+
+        # O PDF só é aberto para copiar as páginas encontradas
         doc = fitz.open(pdf_path)
         pdf_writer = fitz.open()
-        paginas_filtradas = []
-
-        for num_pagina in range(len(doc)):
-            texto = doc[num_pagina].get_text("text", flags=fitz.TEXTFLAGS_TEXT)
-            if termo_busca in texto:
-                pdf_writer.insert_pdf(doc, from_page=num_pagina, to_page=num_pagina)
-                paginas_filtradas.append(num_pagina + 1)
-
-        if paginas_filtradas:
-            nome_pasta = os.path.basename(os.path.dirname(pdf_path))
-            nome_base = os.path.splitext(os.path.basename(pdf_path))[0]
-            nome_arquivo = f"{nome_pasta}_{nome_base}_filtrado.pdf"
-            caminho_saida = os.path.join(pasta_saida, nome_arquivo)
-            pdf_writer.save(caminho_saida)
-            print(f"[✅] Salvo: {caminho_saida} (Páginas: {paginas_filtradas})")
+        for num_pagina in paginas_filtradas:
+            pdf_writer.insert_pdf(doc, from_page=num_pagina - 1, to_page=num_pagina - 1)
+
+        nome_pasta = os.path.basename(os.path.dirname(pdf_path))
+        nome_base = os.path.splitext(os.path.basename(pdf_path))[0]
+        nome_arquivo = f"{nome_pasta}_{nome_base}_filtrado.pdf"
+        caminho_saida = os.path.join(pasta_saida, nome_arquivo)
+        pdf_writer.save(caminho_saida)
+        print(f"[✅] Salvo: {caminho_saida} (Páginas: {paginas_filtradas})")
 
         doc.close()
         pdf_writer.close()
@@ -98,7 +107,7 @@ def buscar_em_multiplos_pdfs():
     def executar():
         inicio = time.time()  # Inicia o temporizador
 
-        with concurrent.futures.ProcessPoolExecutor() as executor:
+        with concurrent.futures.ProcessPoolExecutor(initializer=iniciar_processo) as executor:
             futures = [executor.submit(processar_pdf, pdf, termo, pasta_saida) for pdf in arquivos_pdf]
             concurrent.futures.wait(futures)
 